@@ -1,9 +1,13 @@
-from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+import time
+from dataclasses import dataclass
+from typing import AsyncGenerator, Generator, NamedTuple, Optional, Tuple
+from fastapi import Depends, HTTPException, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
 from app.core import database, security, config
+from app.core.cache import TTLCache
+from app.models.auth_role import AuthRole
 from app.models.user import User
 from app.schemas.token import TokenPayload
 
@@ -17,6 +21,14 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+async def get_async_db() -> AsyncGenerator:
+    """Async counterpart of get_db, see database.AsyncDB."""
+    db = database.AsyncDB()
+    try:
+        yield db
+    finally:
+        await db.close()
+
 def get_current_user(
     db: Session = Depends(get_db),
     token_creds: HTTPAuthorizationCredentials = Depends(security_scheme)
@@ -57,4 +69,233 @@ def get_current_user_optional(
         return None # Return None instead of Error if token is bad
     
     user = db.query(User).filter(User.id == int(token_data.sub)).first()
-    return user
\ No newline at end of file
+    return user
+
+# ------------------------------------------------------------------
+# CACHED PRINCIPAL (read paths: no DB round trip per request)
+# ------------------------------------------------------------------
+
+class RoleSnapshot(NamedTuple):
+    """Read-only copy of an AuthRole row (same attribute names)."""
+    id: int
+    user_id: int
+    org_name: str
+    role_name: str
+    org_type: str
+
+
+class TokenClaims(NamedTuple):
+    user_id: int
+    exp: Optional[float]
+    roles: Optional[Tuple[RoleSnapshot, ...]]  # None = token predates role claims
+    roles_version: Optional[int]
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    What most handlers need from the caller, cached per user for
+    PRINCIPAL_CACHE_TTL_SECONDS. Use get_current_user when the handler
+    modifies the user or needs the ORM object.
+    """
+    id: int
+    email: str
+    department: Optional[str]
+    hostel: Optional[str]
+    current_year: Optional[int]
+    is_superuser: bool
+    roles_version: int
+    authorizations: Tuple[RoleSnapshot, ...]
+
+
+# Verified token -> TokenClaims. Saves the signature check on repeat requests.
+token_cache = TTLCache(
+    maxsize=config.settings.PRINCIPAL_CACHE_SIZE,
+    ttl=config.settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+# User id -> Principal. Dropped by invalidate_principal on profile / role changes.
+principal_cache = TTLCache(
+    maxsize=config.settings.PRINCIPAL_CACHE_SIZE,
+    ttl=config.settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+# User id -> current roles_version, to validate role claims in tokens.
+roles_version_cache = TTLCache(
+    maxsize=config.settings.PRINCIPAL_CACHE_SIZE,
+    ttl=config.settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_principal(user_id: int):
+    """Call after changing a user's profile or roles (this worker; others within the TTL)."""
+    principal_cache.pop(user_id)
+    roles_version_cache.pop(user_id)
+
+
+def bump_roles_version(db: Session, user_id: int):
+    """
+    Call in the same transaction as any AuthRole insert / delete: tokens issued
+    before it stop being trusted for org access (see get_current_roles).
+    """
+    db.query(User).filter(User.id == user_id).update(
+        {User.roles_version: User.roles_version + 1}, synchronize_session=False
+    )
+
+
+def _verified_claims(token: str) -> Optional[TokenClaims]:
+    claims = token_cache.get(token)
+    if claims is not None:
+        if claims.exp is None or claims.exp > time.time():
+            return claims
+        token_cache.pop(token)
+        return None
+    try:
+        payload = jwt.decode(
+            token, config.settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+        )
+        token_data = TokenPayload(**payload)
+        user_id = int(token_data.sub)
+        roles = payload.get("roles")
+        if roles is not None:
+            roles = tuple(RoleSnapshot(r[0], user_id, r[1], r[2], r[3]) for r in roles)
+    except (JWTError, ValueError, TypeError, IndexError):
+        return None
+    claims = TokenClaims(user_id, payload.get("exp"), roles, payload.get("rv"))
+    token_cache.set(token, claims)
+    return claims
+
+
+def _load_principal(db: Session, user_id: int) -> Optional[Principal]:
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    return _fetch_principal(db, user_id)
+
+
+def _fetch_principal(db: Session, user_id: int) -> Optional[Principal]:
+    """Cache miss: two indexed queries, then cached."""
+    user = db.query(
+        User.id, User.email, User.department, User.hostel, User.current_year,
+        User.is_superuser, User.roles_version,
+    ).filter(User.id == user_id).first()
+    if user is None:
+        return None
+    roles = db.query(
+        AuthRole.id, AuthRole.user_id, AuthRole.org_name, AuthRole.role_name, AuthRole.org_type
+    ).filter(AuthRole.user_id == user_id).order_by(AuthRole.id).all()
+    principal = Principal(
+        id=user.id,
+        email=user.email,
+        department=user.department,
+        hostel=user.hostel,
+        current_year=user.current_year,
+        is_superuser=bool(user.is_superuser),
+        roles_version=user.roles_version or 0,
+        authorizations=tuple(RoleSnapshot(*r) for r in roles),
+    )
+    principal_cache.set(user_id, principal)
+    return principal
+
+
+def _current_roles_version(db: Session, user_id: int) -> Optional[int]:
+    version = roles_version_cache.get(user_id)
+    if version is None:
+        version = db.query(User.roles_version).filter(User.id == user_id).scalar()
+        if version is not None:
+            roles_version_cache.set(user_id, version)
+    return version
+
+
+def get_current_principal(
+    db: Session = Depends(get_db),
+    token_creds: HTTPAuthorizationCredentials = Depends(security_scheme)
+) -> Principal:
+    """Like get_current_user (same errors), but served from the cache."""
+    claims = _verified_claims(token_creds.credentials)
+    if claims is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    principal = _load_principal(db, claims.user_id)
+    if principal is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return principal
+
+
+def get_current_principal_optional(
+    db: Session = Depends(get_db),
+    token_creds: Optional[HTTPAuthorizationCredentials] = Depends(security_scheme_optional)
+) -> Optional[Principal]:
+    """Like get_current_user_optional, but served from the cache."""
+    if not token_creds:
+        return None
+    claims = _verified_claims(token_creds.credentials)
+    if claims is None:
+        return None
+    return _load_principal(db, claims.user_id)
+
+
+# Async routes: the same lookups through get_async_db, so that a cache miss
+# doesn't send the request through the threadpool after all
+
+async def get_current_principal_async(
+    db: database.AsyncDB = Depends(get_async_db),
+    token_creds: HTTPAuthorizationCredentials = Depends(security_scheme)
+) -> Principal:
+    """get_current_principal for `async def` endpoints."""
+    claims = _verified_claims(token_creds.credentials)
+    if claims is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    principal = principal_cache.get(claims.user_id) or await db.run(_fetch_principal, claims.user_id)
+    if principal is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return principal
+
+
+async def get_current_principal_optional_async(
+    db: database.AsyncDB = Depends(get_async_db),
+    token_creds: Optional[HTTPAuthorizationCredentials] = Depends(security_scheme_optional)
+) -> Optional[Principal]:
+    """get_current_principal_optional for `async def` endpoints."""
+    if not token_creds:
+        return None
+    claims = _verified_claims(token_creds.credentials)
+    if claims is None:
+        return None
+    return principal_cache.get(claims.user_id) or await db.run(_fetch_principal, claims.user_id)
+
+
+def get_current_roles(
+    response: Response,
+    db: Session = Depends(get_db),
+    token_creds: HTTPAuthorizationCredentials = Depends(security_scheme)
+) -> Tuple[RoleSnapshot, ...]:
+    """
+    The caller's org roles, straight from the token's claims while its "rv"
+    matches the user's roles_version (cached). Otherwise (roles changed, or
+    an older token without claims) they are read from the DB and a fresh
+    token is returned in the X-Access-Token header for the client to swap in.
+    """
+    claims = _verified_claims(token_creds.credentials)
+    if claims is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    if claims.roles is not None and claims.roles_version == _current_roles_version(db, claims.user_id):
+        return claims.roles
+
+    if claims.roles is not None:
+        principal_cache.pop(claims.user_id)  # Roles changed: don't trust the snapshot either
+    principal = _load_principal(db, claims.user_id)
+    if principal is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    # Just read from the DB: also the version to check this user's next tokens against
+    roles_version_cache.set(claims.user_id, principal.roles_version)
+    response.headers[security.ACCESS_TOKEN_HEADER] = security.create_access_token(
+        subject=principal.id, roles=principal.authorizations, roles_version=principal.roles_version
+    )
+    return principal.authorizations
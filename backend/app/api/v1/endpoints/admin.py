@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import Optional
 from sqlalchemy.orm import Session
 from app.api import deps
+from app.core.pagination import keyset_paginate, set_next_cursor
 from app.models.user import User
 from app.models.auth_role import AuthRole
 from app.schemas.user import AuthRoleSchema, UserOut
+from app.services.recommender import recommendation_cache
+from app.services.event_cache import event_response_cache
+from app.services.microsoft_auth import oauth_latency
+from app.services.registration_queue import registration_queue
 
 router = APIRouter()
 
-def get_superuser(current_user: User = Depends(deps.get_current_user)):
+def get_superuser(current_user: deps.Principal = Depends(deps.get_current_principal)):
     """Gatekeeper: Only allow Super Admins."""
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Not a Superuser")
@@ -18,7 +24,7 @@ def authorize_club_head(
     email: str,
     role_data: AuthRoleSchema,
     db: Session = Depends(deps.get_db),
-    admin: User = Depends(get_superuser)
+    admin: deps.Principal = Depends(get_superuser)
 ):
     """Give a student the power to manage a Club/Fest."""
     user = db.query(User).filter(User.email == email).first()
@@ -47,12 +53,48 @@ def authorize_club_head(
         org_type=org_type_str
     )
     db.add(new_role)
+    deps.bump_roles_version(db, user.id)
     db.commit()
+    deps.invalidate_principal(user.id)
     return {"msg": f"Authorized {user.name} for {org_name_str}"}
 
 @router.get("/users", response_model=list[UserOut])
 def list_all_users(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
     db: Session = Depends(deps.get_db),
-    admin: User = Depends(get_superuser)
+    admin: deps.Principal = Depends(get_superuser)
 ):
-    return db.query(User).all()
\ No newline at end of file
+    """All users by id. Unpaginated unless `limit` (and then `cursor`) is given."""
+    query = db.query(User)
+    if limit is None and cursor is None:
+        return query.all()
+
+    limit = limit or 100
+    users = keyset_paginate(query, [User.id], cursor, limit).all()
+    set_next_cursor(response, users, lambda u: (u.id,), limit)
+    return users
+
+@router.get("/cache-stats")
+def get_cache_stats(admin: deps.Principal = Depends(get_superuser)):
+    """Hit/miss counters for the in-process caches (per worker)."""
+    return {
+        "recommendations": recommendation_cache.stats(),
+        "event_responses": event_response_cache.stats(),
+        "principals": deps.principal_cache.stats(),
+        "tokens": deps.token_cache.stats(),
+        "roles_versions": deps.roles_version_cache.stats(),
+    }
+
+
+@router.get("/oauth-stats")
+def get_oauth_stats(admin: deps.Principal = Depends(get_superuser)):
+    """Latency / error counters for the Microsoft login calls (per worker)."""
+    return oauth_latency.stats()
+
+
+@router.get("/registration-queue-stats")
+def get_registration_queue_stats(admin: deps.Principal = Depends(get_superuser)):
+    """Write-behind registration queue of this worker: depth, rejections, batch latency."""
+    return registration_queue.stats()
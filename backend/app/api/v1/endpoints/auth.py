@@ -1,6 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app.api import deps
+from app.core.database import AsyncDB
 from app.services.microsoft_auth import validate_microsoft_code
 from app.models.user import User
 from app.core.security import create_access_token
@@ -12,7 +15,7 @@ router = APIRouter()
 @router.post("/login/microsoft", response_model=Token)
 async def login_microsoft(
     login_data: LoginRequest,
-    db: Session = Depends(deps.get_db)
+    db: AsyncDB = Depends(deps.get_async_db)
 ):
     # 1. Validate Code with Azure
     ms_user = await validate_microsoft_code(login_data.code)
@@ -22,29 +25,58 @@ async def login_microsoft(
     if not email.endswith("iitd.ac.in"):
         raise HTTPException(status_code=400, detail="Only @iitd.ac.in emails allowed")
 
-    # 3. Check DB
+    # 3. Check DB (off the event loop: async driver, or the threadpool)
+    return await db.run(_login_user, email, ms_user["name"])
+
+
+def _upsert_user(db: Session, email: str, name: str) -> User:
+    """
+    Create-or-fetch in one statement: INSERT ... ON CONFLICT (email) DO UPDATE
+    ... RETURNING. The no-op update makes RETURNING yield the existing row, so
+    two concurrent first logins both succeed instead of one hitting the
+    unique constraint.
+    """
+    values = {
+        "email": email,
+        "name": name,
+        "entry_number": email.split("@")[0].upper(),  # Column defaults fill the rest
+    }
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(User).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.email], set_={"email": stmt.excluded.email}
+        ).returning(User)
+        return db.scalars(stmt, execution_options={"populate_existing": True}).one()
+
+    # Other databases: classic select-then-insert, retried on a lost race
     user = db.query(User).filter(User.email == email).first()
-    
-    if not user:
-        # Create new user
-        # Extract entry number logic here if needed
-        entry_number = email.split("@")[0].upper()         
-        user = User(
-            email=email,
-            name=ms_user["name"],
-            entry_number=entry_number
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-        
-    # 4. Create Local JWT
-    access_token = create_access_token(subject=user.id)
+    if user:
+        return user
+    try:
+        with db.begin_nested():
+            user = User(**values)
+            db.add(user)
+        return user
+    except IntegrityError:
+        return db.query(User).filter(User.email == email).one()
+
+
+def _login_user(db: Session, email: str, name: str) -> dict:
+    user = _upsert_user(db, email, name)
+
+    # 4. Create Local JWT (before commit, which would expire `user` and reload it)
+    access_token = create_access_token(
+        subject=user.id, roles=user.authorizations, roles_version=user.roles_version
+    )
+    user_out = UserOut.model_validate(user)  # Serialized here, while the session is open
+    db.commit()
     
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "user": user
+        "user": user_out
     }
 
 @router.get("/me", response_model=UserOut)
@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Query as SAQuery, Session
 from typing import List, Optional
 from app.api import deps
+from app.core.database import AsyncDB
+from app.core.http_cache import cached_response, etag_matches, freeze, http_date, not_modified_since, strong_etag, CACHE_HEADERS
+from app.core.pagination import NEXT_CURSOR_HEADER, keyset_paginate, set_next_cursor
 from app.models.event import Event
-from app.models.user import User
-from app.models.registration import Registration
-from app.schemas.event import EventOut, EventDetail
+from app.schemas.event import EventOut, EventDetail, FeedbackIn
 from app.services.recommender import get_event_recommendations
+from app.services.search import apply_search
+from app.services.registrations import annotate_registered, cancel_registration, check_registrable, is_registered, register_user, submit_feedback
+from app.services.registration_queue import registration_queue
+from app.services.event_cache import dump_json, event_response_cache, listing_cache_key
+from app.services.tags import filter_by_tags, tag_facets
+from app.services.audience import eligibility_clause
 from app.models.enums import OrgType # Import the Enum
 
 router = APIRouter()
@@ -30,108 +37,259 @@ def normalize_org_type(org_type: str) -> str:
     return mapping.get(org_type, org_type.lower())
 
 
+def filter_events(
+    db: Session,
+    org_type: Optional[str],
+    org_name: Optional[str],
+    search: Optional[str],
+    tags: Optional[List[str]],
+    rank: bool = False,
+    eligible_for: Optional[deps.Principal] = None,
+) -> SAQuery:
+    """Shared by the listing and the tag facets so both see the same events."""
+    query = db.query(Event)
+
+    # 1️⃣ ORG TYPE FILTER (Using the new robust normalizer)
+    if org_type:
+        query = query.filter(Event.org_type == org_type)
+
+    # 2️⃣ FINAL ITEM FILTER → org_name (e.g. "DevClub" -> "devclub")
+    if org_name:
+        query = query.filter(Event.org_name == org_name)
+
+    # 3️⃣ TAGS (all must match; indexed lookups on event_tags)
+    if tags:
+        query = filter_by_tags(query, tags)
+
+    # 4️⃣ AUDIENCE (only events this user may attend; compiled rules, see event_audience)
+    if eligible_for is not None:
+        query = query.filter(eligibility_clause(
+            eligible_for.department, eligible_for.hostel, eligible_for.current_year
+        ))
+
+    # 5️⃣ SEARCH (full-text over name, description, tags, org_name)
+    if search:
+        query = apply_search(db, query, search, rank=rank)
+
+    return query
+
+
 @router.get("/", response_model=List[EventOut])
-def get_events(
-    db: Session = Depends(deps.get_db),
-    current_user: Optional[User] = Depends(deps.get_current_user_optional),
+async def get_events(
+    request: Request,
+    response: Response,
+    db: AsyncDB = Depends(deps.get_async_db),
+    current_user: Optional[deps.Principal] = Depends(deps.get_current_principal_optional_async),
 
-    sort_by: str = Query("date", pattern="^(date|popularity)$"),
+    sort_by: str = Query("date", pattern="^(date|popularity|relevance)$"),
 
     # FILTER PARAMS
     org_type: Optional[str] = None,
     board: Optional[str] = None,   
     item: Optional[str] = None,
     search: Optional[str] = None,
+    tag: Optional[List[str]] = Query(None),
+    eligible: bool = False,
 
-    skip: int = 0,
-    limit: int = 20
+    # PAGINATION: pass the X-Next-Cursor header back as `cursor` (date / popularity),
+    # or use skip/limit (offset mode, kept for compatibility)
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
 ):
-    query = db.query(Event)
+    if sort_by == "relevance" and not (search and search.strip()):
+        sort_by = "date"  # Nothing to rank by: default ordering (and cursors)
+    if cursor and sort_by == "relevance":
+        raise HTTPException(status_code=400, detail="Cursor pagination is not supported for sort_by=relevance")
+    if eligible and current_user is None:
+        raise HTTPException(status_code=401, detail="Login required for eligible=true")
 
-    # 1️⃣ ORG TYPE FILTER (Using the new robust normalizer)
-    if org_type:
-        clean_type = normalize_org_type(org_type)
-        query = query.filter(Event.org_type == clean_type)
+    clean_type = normalize_org_type(org_type)
+    org_name = item.lower() if item else None
 
-    # 2️⃣ FINAL ITEM FILTER → org_name (e.g. "DevClub" -> "devclub")
-    if item:
-        query = query.filter(Event.org_name == item.lower())
+    # 0️⃣ ANONYMOUS → serve the same bytes again (304 if the client has them)
+    cache_key = None
+    if current_user is None:
+        cache_key = listing_cache_key(sort_by, clean_type, org_name, search, tag, cursor, skip, limit)
+        cached = event_response_cache.get(cache_key)
+        if cached is not None:
+            return cached_response(request, cached)
 
-    # 3️⃣ SEARCH
-    if search:
-        query = query.filter(Event.name.ilike(f"%{search}%"))
+    return await db.run(
+        _list_events, request, response, current_user, cache_key,
+        sort_by, clean_type, org_name, search, tag, eligible, cursor, skip, limit,
+    )
 
-    # 4️⃣ SORT
-    if sort_by == "date":
-        query = query.order_by(Event.date.asc())
 
-    events = query.offset(skip).limit(limit).all()
+def _list_events(
+    db: Session, request, response, current_user, cache_key,
+    sort_by, clean_type, org_name, search, tag, eligible, cursor, skip, limit,
+):
+    query = filter_events(
+        db, clean_type, org_name, search, tag,
+        rank=(sort_by == "relevance"),
+        eligible_for=current_user if eligible else None,
+    )
 
-    # 5️⃣ REGISTRATION STATUS
-    if current_user:
-        registered_ids = {r.event_id for r in current_user.registrations}
-        for e in events:
-            e.is_registered = e.id in registered_ids
+    # 6️⃣ SORT + PAGE (keyset on an index, id breaks ties)
+    if sort_by == "date":
+        query = keyset_paginate(query, [Event.date, Event.id], cursor, limit)
+    elif sort_by == "popularity":
+        # Denormalized counter, see ix_events_popularity
+        query = keyset_paginate(query, [Event.registration_count, Event.id], cursor, limit, descending=True)
     else:
-        for e in events:
-            e.is_registered = False
+        # After the rank: ties (and the ILIKE fallback, which has no rank) in date order
+        query = query.order_by(Event.date, Event.id).limit(limit)
+    if not cursor:
+        query = query.offset(skip)
 
+    events = query.all()
+    if sort_by == "date":
+        set_next_cursor(response, events, lambda e: (e.date, e.id), limit)
+    elif sort_by == "popularity":
+        set_next_cursor(response, events, lambda e: (e.registration_count, e.id), limit)
+
+    # 7️⃣ REGISTRATION STATUS (one IN query for the page)
+    events = annotate_registered(db, events, current_user.id if current_user else None)
+
+    if cache_key is not None:
+        headers = {}
+        if NEXT_CURSOR_HEADER in response.headers:
+            headers[NEXT_CURSOR_HEADER] = response.headers[NEXT_CURSOR_HEADER]
+        cached = freeze(dump_json(List[EventOut], events), headers=headers)
+        event_response_cache.set(cache_key, cached)
+        return cached_response(request, cached)
     return events
 
+@router.get("/tags")
+async def get_tag_facets(
+    db: AsyncDB = Depends(deps.get_async_db),
+    org_type: Optional[str] = None,
+    item: Optional[str] = None,
+    search: Optional[str] = None,
+    tag: Optional[List[str]] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+):
+    """
+    Tag facet counts for the filter UI, over the events the same filters
+    would list. No filters = one GROUP BY over event_tags.
+    """
+    if not (org_type or item or search or tag):
+        return await db.run(tag_facets, limit=limit)
+
+    def facets(session: Session):
+        events = filter_events(session, normalize_org_type(org_type), item.lower() if item else None, search, tag)
+        return tag_facets(session, events, limit=limit)
+    return await db.run(facets)
+
 @router.get("/recommendations", response_model=List[EventOut])
 def get_recommendations(
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: deps.Principal = Depends(deps.get_current_principal)
 ):
-    return get_event_recommendations(db, current_user.id)
+    events = get_event_recommendations(db, current_user.id)
+    return annotate_registered(db, events, current_user.id)
 
 
 @router.get("/{event_id}", response_model=EventDetail)
-def get_event_detail(
+async def get_event_detail(
     event_id: int,
-    db: Session = Depends(deps.get_db),
-    current_user: Optional[User] = Depends(deps.get_current_user_optional)
+    request: Request,
+    db: AsyncDB = Depends(deps.get_async_db),
+    current_user: Optional[deps.Principal] = Depends(deps.get_current_principal_optional_async)
 ):
+    return await db.run(_event_detail, event_id, request, current_user)
+
+
+def _event_detail(db: Session, event_id: int, request: Request, current_user):
+    if current_user is None:
+        # Anonymous: updated_at moves on every edit / counter bump, so it versions
+        # the payload. One column lookup decides 304 before anything is loaded.
+        updated_at = db.query(Event.updated_at).filter(Event.id == event_id).scalar()
+        if updated_at is not None:
+            etag = strong_etag("event", event_id, updated_at)
+            headers = {"Last-Modified": http_date(updated_at)}
+            if etag_matches(request, etag) or not_modified_since(request, updated_at):
+                return Response(status_code=304, headers={**CACHE_HEADERS, **headers, "ETag": etag})
+            cached = event_response_cache.get(("event", event_id, updated_at))
+            if cached is not None:
+                return cached_response(request, cached)
+
     event = db.query(Event).filter(Event.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
 
-    if current_user:
-        event.is_registered = any(
-            r.event_id == event_id for r in current_user.registrations
-        )
-    else:
-        event.is_registered = False
-
+    event.is_registered = bool(current_user) and is_registered(db, current_user.id, event_id)
+    if current_user is None and updated_at is not None:
+        cached = freeze(dump_json(EventDetail, event), etag=etag, headers=headers)
+        event_response_cache.set(("event", event_id, updated_at), cached)
+        return cached_response(request, cached)
     return event
 
 
 @router.post("/{event_id}/register")
-def register_for_event(
+async def register_for_event(
     event_id: int,
+    response: Response,
     custom_answers: dict = {},
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    queued: bool = False,
+    db: AsyncDB = Depends(deps.get_async_db),
+    current_user: deps.Principal = Depends(deps.get_current_principal_async)
 ):
-    event = db.query(Event).filter(Event.id == event_id).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-
-    existing = db.query(Registration).filter(
-        Registration.user_id == current_user.id,
-        Registration.event_id == event_id
-    ).first()
+    """
+    {"status": "success"}, or {"status": "waitlisted", "position": n} when
+    the event has a capacity and it is full.
+    queued=true: 202 {"status": "pending", "ticket": ...} now, written in a
+    batch shortly after; poll GET /events/{event_id}/register/{ticket}.
+    """
+    if queued:
+        return await db.run(_enqueue_registration, event_id, current_user, custom_answers, response)
+    return await db.run(register_user, event_id, current_user, custom_answers)
 
-    if existing:
-        raise HTTPException(status_code=400, detail="Already registered")
 
-    db.add(
-        Registration(
-            user_id=current_user.id,
-            event_id=event_id,
-            custom_answers=custom_answers
+def _enqueue_registration(db: Session, event_id: int, current_user, custom_answers: dict, response: Response):
+    # 404 / 403 right away; duplicates and seats are settled by the writer
+    check_registrable(db, event_id, current_user)
+    ticket = registration_queue.submit(event_id, current_user, custom_answers)
+    if ticket is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Registrations are busy, please retry",
+            headers={"Retry-After": "1"},
         )
-    )
-    db.commit()
+    response.status_code = 202
+    return {"status": "pending", "ticket": ticket}
+
+
+@router.get("/{event_id}/register/{ticket}")
+async def get_registration_status(
+    event_id: int,
+    ticket: str,
+    current_user: deps.Principal = Depends(deps.get_current_principal_async)
+):
+    """Outcome of a queued registration: pending / success / waitlisted / failed."""
+    result = registration_queue.status(ticket, current_user.id, event_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired ticket")
+    return result
+
 
-    return {"status": "success", "msg": "Registered successfully"}
\ No newline at end of file
+@router.delete("/{event_id}/register")
+async def cancel_event_registration(
+    event_id: int,
+    db: AsyncDB = Depends(deps.get_async_db),
+    current_user: deps.Principal = Depends(deps.get_current_principal_async)
+):
+    """Cancel a registration (or leave the waitlist); the next in line gets the seat."""
+    return await db.run(cancel_registration, event_id, current_user.id)
+
+
+@router.post("/{event_id}/feedback")
+def post_event_feedback(
+    event_id: int,
+    feedback: FeedbackIn,
+    db: Session = Depends(deps.get_db),
+    current_user: deps.Principal = Depends(deps.get_current_principal)
+):
+    """Rate an event you registered for (1-10). Submitting again replaces the rating."""
+    return submit_feedback(db, event_id, current_user.id, feedback.rating)
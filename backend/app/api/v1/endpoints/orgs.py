@@ -1,4 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Response
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.api import deps
 from app.models.user import User
@@ -9,7 +12,15 @@ from app.models.enums import RoleName, OrgType
 from app.schemas.event import EventOut
 from app.schemas.user import TeamMemberCreate
 from app.core.config import settings
-from app.services.exports import generate_event_registration_csv
+from app.core.pagination import TOTAL_COUNT_HEADER, keyset_paginate, set_next_cursor
+from app.core.security import ACCESS_TOKEN_HEADER
+from app.services.analytics import event_analytics, org_dashboard_stats
+from app.services.exports import custom_form_labels, stream_event_registration_csv
+from app.services.feedback import event_feedback_stats, org_feedback_stats
+from app.services.imports import import_event_registrations_csv
+from app.services.recommender import notify_event_created
+from app.services.event_cache import invalidate_event_responses
+from app.services.registrations import REGISTRATION_SORTS, annotate_registered, event_registrations_query
 import shutil
 import os
 import json
@@ -38,23 +49,27 @@ HEAD_ROLES_SET = {
 
 def get_org_role_by_id(
     org_id: int,
-    current_user: User = Depends(deps.get_current_user),
-):
+    response: Response,
+    roles: tuple = Depends(deps.get_current_roles),
+) -> deps.RoleSnapshot:
     """
     Validates that the current user has ANY role in the specific org_id 
-    requested in the URL.
+    requested in the URL. Roles come from the token's claims (no DB access).
     """
-    auth = next((a for a in current_user.authorizations if a.id == org_id), None)
+    auth = next((a for a in roles if a.id == org_id), None)
     
     if not auth:
+        # Keep the re-issued token (if any) so a revoked client stops retrying
+        fresh_token = response.headers.get(ACCESS_TOKEN_HEADER)
         raise HTTPException(
             status_code=403, 
-            detail="You are not authorized to manage this organization."
+            detail="You are not authorized to manage this organization.",
+            headers={ACCESS_TOKEN_HEADER: fresh_token} if fresh_token else None,
         )
     return auth
 
 def get_org_head(
-    role: AuthRole = Depends(get_org_role_by_id)
+    role: deps.RoleSnapshot = Depends(get_org_role_by_id)
 ):
     """
     Validates that the requester is a HEAD (e.g., President, OC).
@@ -75,27 +90,14 @@ def get_org_head(
 def get_org_dashboard(
     org_id: int,
     db: Session = Depends(deps.get_db),
-    role: AuthRole = Depends(get_org_role_by_id)
+    role: deps.RoleSnapshot = Depends(get_org_role_by_id)
 ):
     """Returns stats specific to the selected organization."""
-    # ✅ FIX: Removed .value (role.org_name is already a string)
-    org_events = db.query(Event).filter(Event.org_name == role.org_name).all()
-    
-    total_events = len(org_events)
-    total_regs = sum(len(e.registrations) for e in org_events)
-    
-    dept_counts = {}
-    for event in org_events:
-        for reg in event.registrations:
-            dept = reg.user.department or "Unknown"
-            dept_counts[dept] = dept_counts.get(dept, 0) + 1
-
+    # Precomputed rollups (see services/rollups.py), nothing per registration is loaded
     return {
         "org_name": role.org_name,
         "your_role": role.role_name,
-        "total_events": total_events,
-        "total_registrations": total_regs,
-        "dept_analytics": dept_counts 
+        **org_dashboard_stats(db, role.org_name),
     }
 
 # ------------------------------------------------------------------
@@ -105,11 +107,23 @@ def get_org_dashboard(
 @router.get("/{org_id}/events", response_model=list[EventOut])
 def get_org_events(
     org_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
     db: Session = Depends(deps.get_db),
-    role: AuthRole = Depends(get_org_role_by_id)
+    current_user: deps.Principal = Depends(deps.get_current_principal),
+    role: deps.RoleSnapshot = Depends(get_org_role_by_id)
 ):
+    """Newest first. Unpaginated unless `limit` (and then `cursor`) is given."""
     # ✅ FIX: Removed .value
-    return db.query(Event).filter(Event.org_name == role.org_name).order_by(Event.date.desc()).all()
+    query = db.query(Event).filter(Event.org_name == role.org_name)
+    if limit is None and cursor is None:
+        events = query.order_by(Event.date.desc(), Event.id.desc()).all()
+    else:
+        limit = limit or 50
+        events = keyset_paginate(query, [Event.date, Event.id], cursor, limit, descending=True).all()
+        set_next_cursor(response, events, lambda e: (e.date, e.id), limit)
+    return annotate_registered(db, events, current_user.id)
 
 @router.post("/{org_id}/events", response_model=EventOut)
 def create_org_event(
@@ -122,11 +136,12 @@ def create_org_event(
     custom_form_schema: str = Form("[]"),
     target_audience: str = Form("{}"), 
     is_private: bool = Form(False),
+    capacity: Optional[int] = Form(None),
     photo: UploadFile = File(None),
     
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user),
-    role: AuthRole = Depends(get_org_role_by_id)
+    current_user: deps.Principal = Depends(deps.get_current_principal),
+    role: deps.RoleSnapshot = Depends(get_org_role_by_id)
 ):
     # 1. Handle File Upload
     filename = None
@@ -147,6 +162,8 @@ def create_org_event(
         date_obj = datetime.fromisoformat(date)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid data format: {str(e)}")
+    if capacity is not None and capacity < 1:
+        raise HTTPException(status_code=400, detail="Capacity must be at least 1")
 
     # 3. Create Event
     event = Event(
@@ -159,6 +176,7 @@ def create_org_event(
         custom_form_schema=schema_list,
         target_audience=audience_dict,
         is_private=is_private,
+        capacity=capacity,
         
         # ✅ FIX: Pass string directly
         org_name=role.org_name, 
@@ -170,6 +188,10 @@ def create_org_event(
     db.add(event)
     db.commit()
     db.refresh(event)
+
+    # 4. Keep the recommender index & the response caches in sync
+    notify_event_created(event)
+    invalidate_event_responses()
     return event
 
 # ------------------------------------------------------------------
@@ -180,43 +202,92 @@ def create_org_event(
 def get_event_registrations(
     org_id: int,
     event_id: int,
+    response: Response,
+    sort_by: str = Query("registered_at", pattern="^(registered_at|name|entry_number|department|year)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    department: Optional[str] = None,
+    year: Optional[int] = None,
+    hostel: Optional[str] = None,
+    registered_from: Optional[datetime] = None,
+    registered_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(deps.get_db),
-    role: AuthRole = Depends(get_org_role_by_id)
+    role: deps.RoleSnapshot = Depends(get_org_role_by_id)
 ):
-    """View list of students registered for a specific event."""
+    """
+    View list of students registered for a specific event, one page
+    (`limit`, default 100) at a time; X-Total-Count (matching rows) comes
+    with the first page.
+    """
     # ✅ FIX: Removed .value
+    owned = db.query(Event.id).filter(Event.id == event_id, Event.org_name == role.org_name).first()
+    if not owned:
+        raise HTTPException(status_code=404, detail="Event not found or not owned by you")
+
+    # 1. One join query, plain columns (no Registration / User objects)
+    query = event_registrations_query(
+        db, event_id, sort_by, department, year, hostel, registered_from, registered_to
+    )
+    if not cursor:
+        total = query.with_entities(func.count(Registration.id)).scalar()
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+
+    # 2. Server-side sort, keyset on (sort key, id)
+    columns = [REGISTRATION_SORTS[sort_by], Registration.id]
+    rows = keyset_paginate(query, columns, cursor, limit, descending=(order == "desc")).all()
+    set_next_cursor(response, rows, lambda r: (r.sort_key, r.registration_id), limit)
+
+    return [
+        {
+            "registration_id": r.registration_id,
+            "name": r.name,
+            "email": r.email,
+            "entry_number": r.entry_number,
+            "department": r.department,
+            "current_year": r.current_year,
+            "hostel": r.hostel,
+            "custom_answers": r.custom_answers,
+            "registered_at": r.registered_at,
+            "feedback_rating": r.feedback_rating,
+        }
+        for r in rows
+    ]
+
+@router.post("/{org_id}/events/{event_id}/registrations/import")
+def import_event_registrations(
+    org_id: int,
+    event_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(deps.get_db),
+    role: deps.RoleSnapshot = Depends(get_org_role_by_id)
+):
+    """Bulk-register students from an offline sign-up sheet (CSV with entry numbers / emails)."""
     event = db.query(Event).filter(Event.id == event_id, Event.org_name == role.org_name).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found or not owned by you")
-    
-    results = []
-    for reg in event.registrations:
-        results.append({
-            "name": reg.user.name,
-            "email": reg.user.email,
-            "entry_number": reg.user.entry_number,
-            "custom_answers": reg.custom_answers,
-            "registered_at": reg.registered_at
-        })
-    return results
+
+    try:
+        return import_event_registrations_csv(db, event, file.file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{org_id}/events/{event_id}/csv")
 def download_event_csv(
     org_id: int,
     event_id: int,
     db: Session = Depends(deps.get_db),
-    role: AuthRole = Depends(get_org_role_by_id)
+    role: deps.RoleSnapshot = Depends(get_org_role_by_id)
 ):
     """Download the attendee list as a CSV file."""
     # ✅ FIX: Removed .value
-    event = db.query(Event).filter(Event.id == event_id, Event.org_name == role.org_name).first()
+    event = db.query(Event.custom_form_schema).filter(Event.id == event_id, Event.org_name == role.org_name).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
 
-    csv_file = generate_event_registration_csv(db, event_id)
-    
-    return Response(
-        content=csv_file.getvalue(),
+    # Streamed: rows are written out as they are read, never held all at once
+    return StreamingResponse(
+        stream_event_registration_csv(event_id, custom_form_labels(event.custom_form_schema)),
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename=registrations_{event_id}.csv"}
     )
@@ -226,24 +297,38 @@ def get_event_feedback(
     org_id: int,
     event_id: int,
     db: Session = Depends(deps.get_db),
-    role: AuthRole = Depends(get_org_role_by_id)
+    role: deps.RoleSnapshot = Depends(get_org_role_by_id)
 ):
-    """Get average rating and stats."""
+    """Average, count, distribution, percentiles and daily trend of the ratings."""
     # ✅ FIX: Removed .value
-    event = db.query(Event).filter(Event.id == event_id, Event.org_name == role.org_name).first()
-    if not event:
+    owned = db.query(Event.id).filter(Event.id == event_id, Event.org_name == role.org_name).first()
+    if not owned:
         raise HTTPException(status_code=404, detail="Event not found")
-        
-    ratings = [r.feedback_rating for r in event.registrations if r.feedback_rating]
-    
-    if not ratings:
-        return {"average": 0, "count": 0, "distribution": {}}
-        
-    return {
-        "average": round(sum(ratings) / len(ratings), 1),
-        "count": len(ratings),
-        "distribution": {i: ratings.count(i) for i in range(1, 11)}
-    }
+
+    # One GROUP BY in the database (see services/feedback.py)
+    return event_feedback_stats(db, event_id)
+
+@router.get("/{org_id}/feedback")
+def get_org_feedback(
+    org_id: int,
+    db: Session = Depends(deps.get_db),
+    role: deps.RoleSnapshot = Depends(get_org_role_by_id)
+):
+    """Feedback stats for every event of the organization, for side-by-side comparison."""
+    return org_feedback_stats(db, role.org_name)
+
+@router.get("/{org_id}/events/{event_id}/analytics")
+def get_event_analytics(
+    org_id: int,
+    event_id: int,
+    db: Session = Depends(deps.get_db),
+    role: deps.RoleSnapshot = Depends(get_org_role_by_id)
+):
+    """Per-event audience breakdowns, daily registrations and rating histogram (rollups)."""
+    owned = db.query(Event.id).filter(Event.id == event_id, Event.org_name == role.org_name).first()
+    if not owned:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return event_analytics(db, event_id)
 
 # ------------------------------------------------------------------
 # 👥 TEAM MANAGEMENT (Strictly Protected)
@@ -253,7 +338,7 @@ def get_event_feedback(
 def get_team_members(
     org_id: int,
     db: Session = Depends(deps.get_db),
-    role: AuthRole = Depends(get_org_role_by_id)
+    role: deps.RoleSnapshot = Depends(get_org_role_by_id)
 ):
     """View all team members."""
     # ✅ FIX: Removed .value
@@ -270,7 +355,7 @@ def add_team_member(
     org_id: int,
     member_in: TeamMemberCreate,
     db: Session = Depends(deps.get_db),
-    head_role: AuthRole = Depends(get_org_head)
+    head_role: deps.RoleSnapshot = Depends(get_org_head)
 ):
     """
     Appoint a new team member.
@@ -304,7 +389,9 @@ def add_team_member(
         org_type=head_role.org_type
     )
     db.add(new_role)
+    deps.bump_roles_version(db, target_user.id)
     db.commit()
+    deps.invalidate_principal(target_user.id)
     return {"msg": "Member added"}
 
 @router.delete("/{org_id}/team/{user_id}")
@@ -312,7 +399,7 @@ def remove_team_member(
     org_id: int,
     user_id: int,
     db: Session = Depends(deps.get_db),
-    head_role: AuthRole = Depends(get_org_head)
+    head_role: deps.RoleSnapshot = Depends(get_org_head)
 ):
     if user_id == head_role.user_id:
         raise HTTPException(status_code=400, detail="Cannot remove yourself")
@@ -334,6 +421,8 @@ def remove_team_member(
         )
     
     db.delete(role_to_delete)
+    deps.bump_roles_version(db, user_id)
     db.commit()
+    deps.invalidate_principal(user_id)
     
     return {"msg": "Member removed"}
\ No newline at end of file
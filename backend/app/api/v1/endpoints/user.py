@@ -2,23 +2,43 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.api import deps
 from app.models.user import User
+from app.models.event import Event
 from app.schemas.user import UserOut, UserUpdate
 from app.schemas.event import EventOut
 from app.models.registration import Registration
+from app.services.recommender import invalidate_user_recommendations
+from app.services.rollups import rollup_user
 import uuid
 
 router = APIRouter()
 
+ROLLUP_FIELDS = {"department", "current_year", "hostel"}
+
 @router.put("/profile", response_model=UserOut)
 def update_profile(
     user_in: UserUpdate,
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user)
 ):
-    for field, value in user_in.dict(exclude_unset=True).items():
+    changes = user_in.dict(exclude_unset=True)
+    # Analytics rollups count registrations by department / year / hostel:
+    # move this user's registrations from the old profile to the new one
+    moves_rollups = any(
+        field in ROLLUP_FIELDS and getattr(current_user, field) != value
+        for field, value in changes.items()
+    )
+    if moves_rollups:
+        rollup_user(db, current_user.id, -1)
+
+    for field, value in changes.items():
         setattr(current_user, field, value)
 
+    if moves_rollups:
+        db.flush()
+        rollup_user(db, current_user.id, 1)
+    invalidate_user_recommendations(current_user.id, db)
     db.commit()
+    deps.invalidate_principal(current_user.id)
     db.refresh(current_user)
     return current_user
 
@@ -26,9 +46,17 @@ def update_profile(
 @router.get("/calendar", response_model=list[EventOut])
 def get_my_calendar(
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: deps.Principal = Depends(deps.get_current_principal)
 ):
     """Get all events the user has registered for."""
-    # SQLAlchemy relationship magic
-    return [reg.event for reg in current_user.registrations]
+    events = (
+        db.query(Event)
+        .join(Registration, Registration.event_id == Event.id)
+        .filter(Registration.user_id == current_user.id)
+        .order_by(Event.date)
+        .all()
+    )
+    for e in events:
+        e.is_registered = True  # By construction, no extra lookup needed
+    return events
 
@@ -0,0 +1,146 @@
+"""
+Maintenance commands. Run from the backend folder:
+
+    python -m app.cli upgrade-schema
+    python -m app.cli precompute-recommendations --top-n 20 --chunk-size 500
+    python -m app.cli rebuild-search-index
+    python -m app.cli recount-registrations
+    python -m app.cli rebuild-tag-index
+    python -m app.cli rebuild-audience-index
+    python -m app.cli rebuild-rollups
+"""
+import argparse
+import importlib
+import pkgutil
+import time
+
+import app.models
+from app.core.database import SessionLocal, engine
+
+
+def _load_models():
+    for module in pkgutil.iter_modules(app.models.__path__):
+        importlib.import_module(f"app.models.{module.name}")
+
+
+def _session():
+    """
+    A session with every model registered. Relationships name their targets
+    as strings, so a mapper only configures once all model modules are
+    imported (the API gets that from its routers; here nothing else does).
+    """
+    _load_models()
+    return SessionLocal()
+
+
+def precompute_recommendations(args):
+    from app.services.recommender import precompute_all_recommendations
+
+    db = _session()
+    try:
+        started = time.perf_counter()
+        written = precompute_all_recommendations(db, top_n=args.top_n, chunk_size=args.chunk_size)
+        print(f"Precomputed recommendations for {written} users in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+
+
+def rebuild_search_index(args):
+    from app.services.search import rebuild_search_index as rebuild
+
+    db = SessionLocal()
+    try:
+        rebuild(db)
+        print("Search index rebuilt")
+    finally:
+        db.close()
+
+
+def recount_registrations(args):
+    from app.services.counters import recount_event_counters
+
+    db = _session()
+    try:
+        updated = recount_event_counters(db)
+        print(f"Recounted registrations / ratings for {updated} events")
+    finally:
+        db.close()
+
+
+def rebuild_tag_index(args):
+    from app.services.tags import rebuild_tag_index as rebuild
+
+    db = _session()
+    try:
+        written = rebuild(db)
+        print(f"Rebuilt event_tags ({written} rows)")
+    finally:
+        db.close()
+
+
+def rebuild_audience_index(args):
+    from app.services.audience import rebuild_audience_index as rebuild
+
+    db = _session()
+    try:
+        processed = rebuild(db)
+        print(f"Recompiled target audiences for {processed} events")
+    finally:
+        db.close()
+
+
+def rebuild_rollups(args):
+    from app.services.rollups import rebuild_rollups as rebuild
+
+    db = _session()
+    try:
+        started = time.perf_counter()
+        read = rebuild(db)
+        print(f"Rebuilt event / org rollups from {read} registrations in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+
+
+def upgrade_schema(args):
+    from app.services.schema import upgrade_schema as upgrade
+
+    _load_models()
+    applied = upgrade(engine)
+    for ddl in applied:
+        print(ddl)
+    print(f"Schema up to date ({len(applied)} changes)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("precompute-recommendations", help="Batch top-N recommendations for all users")
+    p.add_argument("--top-n", type=int, default=20)
+    p.add_argument("--chunk-size", type=int, default=500)
+    p.set_defaults(func=precompute_recommendations)
+
+    p = commands.add_parser("rebuild-search-index", help="Create / refresh the event full-text index")
+    p.set_defaults(func=rebuild_search_index)
+
+    p = commands.add_parser("recount-registrations", help="Repair Event registration / rating counters")
+    p.set_defaults(func=recount_registrations)
+
+    p = commands.add_parser("rebuild-tag-index", help="Re-derive event_tags from Event.tags")
+    p.set_defaults(func=rebuild_tag_index)
+
+    p = commands.add_parser("rebuild-audience-index", help="Recompile event_audience from Event.target_audience")
+    p.set_defaults(func=rebuild_audience_index)
+
+    p = commands.add_parser("rebuild-rollups", help="Recompute event_rollups / org_rollups from registrations")
+    p.set_defaults(func=rebuild_rollups)
+
+    p = commands.add_parser("upgrade-schema", help="Create missing tables / columns / indexes (additive only)")
+    p.set_defaults(func=upgrade_schema)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
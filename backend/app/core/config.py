@@ -30,7 +30,7 @@
 # settings = Settings()
 
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str
@@ -49,12 +49,51 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str
+    # Optional async driver URL (postgresql+asyncpg://... / sqlite+aiosqlite:///...).
+    # When set, the async endpoints (events, auth, registration) use it.
+    ASYNC_DATABASE_URL: Optional[str] = None
+
+    # Recommendations cache (per-user, in-process)
+    RECOMMENDATION_CACHE_SIZE: int = 10000
+    RECOMMENDATION_CACHE_TTL_SECONDS: int = 600
+    # Batch results older than this are ignored (live path is used instead)
+    RECOMMENDATION_PRECOMPUTE_MAX_AGE_HOURS: int = 26
+    # Share of the final score from item-item collaborative filtering (0 = content only)
+    RECOMMENDATION_CF_WEIGHT: float = 0.3
+
+    # Anonymous GET /events responses (per worker; also dropped on event create / edit)
+    EVENT_RESPONSE_CACHE_SIZE: int = 512
+    EVENT_RESPONSE_CACHE_TTL_SECONDS: int = 30
+
+    # Authenticated principal cache (per worker). Profile / role changes are
+    # applied at once on the worker that made them, elsewhere within the TTL.
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+
+    # Write-behind registrations (POST /events/{id}/register?queued=true), per worker
+    REGISTRATION_QUEUE_SIZE: int = 10000  # Full queue = 503 + Retry-After
+    REGISTRATION_QUEUE_BATCH_SIZE: int = 500
+    REGISTRATION_QUEUE_MAX_WAIT_MS: int = 50  # How long a batch waits to fill up
+    REGISTRATION_STATUS_TTL_SECONDS: int = 900
+
+    # Analytics rollups are folded in after commit, per worker (see services/rollups.py)
+    ROLLUP_FLUSH_INTERVAL_SECONDS: float = 2.0
+    ROLLUP_FLUSH_MAX_ATTEMPTS: int = 3  # Then written key by key, failing keys dropped
 
     # Microsoft OAuth
     MS_CLIENT_ID: str
     MS_CLIENT_SECRET: str
     MS_TENANT_ID: str
     MS_REDIRECT_URI: str
+    # Overridable for a local mock OAuth / Graph server
+    MS_LOGIN_BASE_URL: str = "https://login.microsoftonline.com"
+    MS_GRAPH_BASE_URL: str = "https://graph.microsoft.com"
+    # Shared outbound client (one pool per worker)
+    MS_HTTP2: bool = True  # Needs the optional `h2` package, else HTTP/1.1 keep-alive
+    MS_HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    MS_HTTP_READ_TIMEOUT_SECONDS: float = 10.0
+    MS_HTTP_MAX_CONNECTIONS: int = 100
+    MS_HTTP_MAX_CONCURRENCY: int = 50
 
     class Config:
         env_file = ".env"
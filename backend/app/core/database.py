@@ -1,5 +1,6 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
 
 # Handling SQLite specific check for threading
@@ -11,4 +12,45 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+# ------------------------------------------------------------------
+# Optional async path (ASYNC_DATABASE_URL, e.g. postgresql+asyncpg://...)
+# ------------------------------------------------------------------
+
+AsyncSessionLocal = None
+if settings.ASYNC_DATABASE_URL:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(settings.ASYNC_DATABASE_URL, pool_pre_ping=True)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+
+class AsyncDB:
+    """
+    Lets `async def` endpoints run the existing (sync) ORM code without
+    blocking the event loop. With an async engine configured, `run` goes
+    through AsyncSession.run_sync: the same Session API, but I/O is awaited on
+    the async driver, so concurrency is not bounded by the threadpool.
+    Without one, it falls back to a regular Session in the threadpool.
+    """
+
+    def __init__(self):
+        if AsyncSessionLocal is not None:
+            self._async_session = AsyncSessionLocal()
+            self._session = None
+        else:
+            self._async_session = None
+            self._session = SessionLocal()
+
+    async def run(self, fn, *args, **kwargs):
+        """Calls fn(session, *args, **kwargs) and returns its result."""
+        if self._async_session is not None:
+            return await self._async_session.run_sync(lambda session: fn(session, *args, **kwargs))
+        return await run_in_threadpool(fn, self._session, *args, **kwargs)
+
+    async def close(self):
+        if self._async_session is not None:
+            await self._async_session.close()
+        else:
+            await run_in_threadpool(self._session.close)
@@ -0,0 +1,64 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import NamedTuple, Optional
+from fastapi import Request, Response
+
+# Anonymous responses only: clients (and proxies) must revalidate every time,
+# and must not reuse them for a logged-in request to the same URL.
+CACHE_HEADERS = {"Cache-Control": "no-cache", "Vary": "Authorization"}
+
+
+class CachedBody(NamedTuple):
+    """A serialized JSON response ready to be replayed."""
+    body: bytes
+    etag: str
+    headers: dict
+
+
+def strong_etag(*parts) -> str:
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def freeze(body: bytes, etag: Optional[str] = None, headers: Optional[dict] = None) -> CachedBody:
+    """Defaults to a content hash, which is a strong ETag by definition."""
+    return CachedBody(body, etag or strong_etag(hashlib.sha256(body).hexdigest()), headers or {})
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 13.1.2): W/"x" matches "x"
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def not_modified_since(request: Request, last_modified: datetime) -> bool:
+    """If-Modified-Since check; ignored when If-None-Match is present."""
+    header = request.headers.get("if-modified-since")
+    if not header or request.headers.get("if-none-match"):
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+        if since.tzinfo:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return False
+    return last_modified.replace(microsecond=0) <= since
+
+
+def http_date(value: datetime) -> str:
+    """Naive UTC datetime (as stored by the models) -> HTTP-date."""
+    return format_datetime(value.replace(microsecond=0, tzinfo=timezone.utc), usegmt=True)
+
+
+def cached_response(request: Request, cached: CachedBody) -> Response:
+    """304 (no body) when the client already has this version, else the stored bytes."""
+    headers = {**CACHE_HEADERS, **cached.headers, "ETag": cached.etag}
+    if etag_matches(request, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
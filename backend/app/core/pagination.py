@@ -0,0 +1,74 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+# Header carrying the cursor for the next page (bodies stay plain lists)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Total matching rows, sent with the first page only
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque, URL-safe cursor from the sort key of the last row on a page."""
+    raw = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(raw).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(raw, list) or len(raw) != len(columns):
+            raise ValueError("wrong shape")
+        return [_cursor_value(column, value) for column, value in zip(columns, raw)]
+    except (ValueError, TypeError, NotImplementedError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _cursor_value(column, value):
+    """The cursor value as the column's Python type; anything else is a bad cursor."""
+    if value is None:
+        return None
+    expected = column.type.python_type
+    if expected is datetime:
+        return datetime.fromisoformat(value)
+    if expected is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if type(value) is not expected:  # Also keeps bools out of int columns
+        raise ValueError(f"expected {expected.__name__}")
+    return value
+
+
+def keyset_paginate(
+    query: Query,
+    columns: Sequence[Any],
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False,
+) -> Query:
+    """
+    Orders by `columns` (the last one must be unique, e.g. id) and seeks past
+    the cursor: WHERE (a > x) OR (a = x AND b > y) ... which lets the DB walk
+    the index on the leading column instead of counting OFFSET rows.
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        clauses = []
+        for i, column in enumerate(columns):
+            equal = [c == v for c, v in zip(columns[:i], values[:i])]
+            step = column < values[i] if descending else column > values[i]
+            clauses.append(and_(*equal, step))
+        query = query.filter(or_(*clauses))
+
+    order = [c.desc() if descending else c.asc() for c in columns]
+    return query.order_by(*order).limit(limit)
+
+
+def set_next_cursor(response: Response, rows: list, keys, limit: int):
+    """Adds the next-page cursor header when the page is full."""
+    if rows and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(keys(rows[-1]))
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from typing import Optional, Union, Any
+from typing import Iterable, Optional, Union, Any
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
@@ -7,13 +7,29 @@ from app.core.config import settings
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 ALGORITHM = "HS256"
 
-def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+# Response header carrying a re-issued token when the caller's role claims were stale
+ACCESS_TOKEN_HEADER = "X-Access-Token"
+
+def create_access_token(
+    subject: Union[str, Any],
+    expires_delta: Optional[timedelta] = None,
+    roles: Optional[Iterable] = None,
+    roles_version: Optional[int] = None,
+) -> str:
+    """
+    `roles` (AuthRole rows or snapshots) are embedded as compact claims:
+    [[auth_role_id, org_name, role_name, org_type], ...] plus the user's
+    roles_version ("rv"), so org endpoints can authorize from the token alone.
+    """
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode = {"exp": expire, "sub": str(subject)}
+    if roles is not None:
+        to_encode["roles"] = [[r.id, r.org_name, r.role_name, r.org_type] for r in roles]
+        to_encode["rv"] = roles_version or 0
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
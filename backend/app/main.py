@@ -1,14 +1,31 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from app.core.config import settings
+from app.core.pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER
+from app.core.security import ACCESS_TOKEN_HEADER
 from app.api.v1.router import api_router
+from app.services.microsoft_auth import close_http_client
+from app.services.registration_queue import registration_queue
+from app.services.rollups import rollup_writer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_http_client()
+    await run_in_threadpool(registration_queue.stop)  # Flush queued registrations
+    await run_in_threadpool(rollup_writer.stop)  # Then the rollup deltas they produced
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 
@@ -22,6 +39,7 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, ACCESS_TOKEN_HEADER],
     )
 
 # -----------------------
@@ -1,8 +1,25 @@
-from sqlalchemy import Column, Integer, String, Boolean, JSON, Text, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, JSON, Text, DateTime, Enum, ForeignKey, Index, DDL, false, func, cast, literal_column
+from sqlalchemy.dialects import postgresql  # also registers the typed to_tsvector / to_tsquery
+from sqlalchemy.event import listen
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm.attributes import get_history
 from app.core.database import Base
 from datetime import datetime
 from app.models.enums import OrgType, OrgName # Import both Enums
+from app.models.event_tag import EventTag, normalize_tags
+from app.models.event_audience import EventAudience, compile_audience
+
+# Constants are inlined (not bound) so the query expression is textually
+# identical to the indexed one on every driver.
+SEARCH_CONFIG = cast(literal_column("'english'"), postgresql.REGCONFIG)
+
+def _search_vector(name, description, tags, org_name):
+    space = literal_column("' '")
+    return func.to_tsvector(
+        SEARCH_CONFIG,
+        name + space + description + space
+        + func.coalesce(cast(tags, Text), literal_column("''")) + space + org_name,
+    )
 
 class Event(Base):
     __tablename__ = "events"
@@ -26,10 +43,117 @@ class Event(Base):
     target_audience = Column(JSON, default=dict)
     is_private = Column(Boolean, default=False, index=True)
     custom_form_schema = Column(JSON, default=list) 
+    # Seats; NULL = unlimited. Further registrations go to waitlist_entries
+    capacity = Column(Integer, nullable=True)
+    # False = open to everyone; else the rules live in event_audience
+    audience_restricted = Column(Boolean, nullable=False, default=False, server_default=false())
+
+    # Denormalized counters (kept in step by services/counters.py)
+    registration_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
-    registrations = relationship("Registration", back_populates="event", cascade="all, delete-orphan")
\ No newline at end of file
+    registrations = relationship("Registration", back_populates="event", cascade="all, delete-orphan")
+
+    @property
+    def avg_rating(self):
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 1)
+
+    # Full-text search. Postgres: GIN expression index, kept current by the DB
+    # on every INSERT/UPDATE (SQLite uses the FTS5 table below).
+    __table_args__ = (
+        Index(
+            "ix_events_search",
+            _search_vector(name, description, tags, org_name),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+        # sort_by=popularity (+ keyset cursor on the same columns)
+        Index("ix_events_popularity", registration_count, id),
+    )
+
+
+# services/search.py queries with this exact expression so the planner uses the index
+search_vector = _search_vector(
+    Event.__table__.c.name, Event.__table__.c.description,
+    Event.__table__.c.tags, Event.__table__.c.org_name,
+)
+
+# SQLite (local/tests): FTS5 external-content table synced by triggers.
+# Created with the events table; `python -m app.cli rebuild-search-index` adds it to existing DBs.
+SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+        name, description, tags, org_name, content='events', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS events_fts_ai AFTER INSERT ON events BEGIN
+        INSERT INTO events_fts(rowid, name, description, tags, org_name)
+        VALUES (new.id, new.name, new.description, new.tags, new.org_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_fts_ad AFTER DELETE ON events BEGIN
+        INSERT INTO events_fts(events_fts, rowid, name, description, tags, org_name)
+        VALUES ('delete', old.id, old.name, old.description, old.tags, old.org_name);
+    END""",
+    # Indexed columns only: counter / capacity / popularity updates leave the FTS row alone
+    """CREATE TRIGGER IF NOT EXISTS events_fts_au AFTER UPDATE OF name, description, tags, org_name ON events BEGIN
+        INSERT INTO events_fts(events_fts, rowid, name, description, tags, org_name)
+        VALUES ('delete', old.id, old.name, old.description, old.tags, old.org_name);
+        INSERT INTO events_fts(rowid, name, description, tags, org_name)
+        VALUES (new.id, new.name, new.description, new.tags, new.org_name);
+    END""",
+]
+for statement in SQLITE_FTS_DDL:
+    listen(Event.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+
+
+# Normalized copies of the JSON columns: tags -> event_tags, target_audience ->
+# event_audience. Written inside the flush, so they commit or roll back with
+# the event. Bulk query.update() bypasses these hooks: it is only used for the
+# counters, never for tags / audience.
+def _replace_rows(connection, table, event_id, rows):
+    connection.execute(table.delete().where(table.c.event_id == event_id))
+    if rows:
+        connection.execute(table.insert(), [{"event_id": event_id, **row} for row in rows])
+
+
+def _write_event_tags(connection, event_id, tags):
+    _replace_rows(connection, EventTag.__table__, event_id, [{"tag": t} for t in normalize_tags(tags)])
+
+
+def _write_event_audience(connection, event_id, target_audience):
+    rules = compile_audience(target_audience)
+    _replace_rows(connection, EventAudience.__table__, event_id, [{"kind": k, "value": v} for k, v in rules])
+
+
+def _before_save(mapper, connection, target):
+    target.audience_restricted = bool(compile_audience(target.target_audience))
+
+
+def _after_insert(mapper, connection, target):
+    _write_event_tags(connection, target.id, target.tags)
+    _write_event_audience(connection, target.id, target.target_audience)
+
+
+def _after_update(mapper, connection, target):
+    if get_history(target, "tags").has_changes():
+        _write_event_tags(connection, target.id, target.tags)
+    if get_history(target, "target_audience").has_changes():
+        _write_event_audience(connection, target.id, target.target_audience)
+
+
+def _after_delete(mapper, connection, target):
+    _write_event_tags(connection, target.id, [])
+    _write_event_audience(connection, target.id, {})
+
+
+listen(Event, "before_insert", _before_save)
+listen(Event, "before_update", _before_save)
+listen(Event, "after_insert", _after_insert)
+listen(Event, "after_update", _after_update)
+listen(Event, "after_delete", _after_delete)
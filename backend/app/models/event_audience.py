@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from app.core.database import Base
+
+# target_audience keys (see OrgDashboard) -> rule kind
+AUDIENCE_KINDS = {"depts": "dept", "hostels": "hostel", "years": "year"}
+
+class EventAudience(Base):
+    """
+    Compiled Event.target_audience: one row per allowed value, e.g.
+    (7, "dept", "cse"), (7, "year", "2"). A kind with no rows means everyone,
+    so "events this user may attend" is a few index probes per event.
+    Maintained by the Event mapper hooks in models/event.py.
+    """
+    __tablename__ = "event_audience"
+
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+
+    __table_args__ = (
+        Index("ix_event_audience_kind_value", "kind", "value", "event_id"),
+    )
+
+
+def audience_value(value) -> str:
+    """Canonical form shared by the compiled rules and the user-side lookups."""
+    return str(value).strip().lower()
+
+
+def compile_audience(target_audience) -> list:
+    """{"depts": ["CSE"], "years": [2]} -> [("dept", "cse"), ("year", "2")]."""
+    if not isinstance(target_audience, dict):
+        return []
+    rules = []
+    for key, kind in AUDIENCE_KINDS.items():
+        for value in target_audience.get(key) or []:
+            if value is None or str(value).strip() == "":
+                continue
+            rule = (kind, audience_value(value))
+            if rule not in rules:
+                rules.append(rule)
+    return rules
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, ForeignKey
+from app.core.database import Base
+
+class EventRollup(Base):
+    """
+    Precomputed per-event registration analytics: one counter per
+    (dimension, value), e.g. ("dept", "CSE") or ("rating", "8").
+    Maintained incrementally by services/rollups.py; rebuild with
+    `python -m app.cli rebuild-rollups`.
+    """
+    __tablename__ = "event_rollups"
+
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    dimension = Column(String, primary_key=True)  # dept / year / hostel / day / rating
+    value = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0, server_default="0")
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from app.core.database import Base
+
+class EventTag(Base):
+    """
+    One row per (event, tag): the normalized copy of Event.tags, so tag
+    filters and facet counts are index lookups instead of JSON scans.
+    Maintained by the Event mapper hooks in models/event.py.
+    """
+    __tablename__ = "event_tags"
+
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String, primary_key=True)
+
+    __table_args__ = (
+        # tag -> events (filter, facets); the PK covers event -> tags
+        Index("ix_event_tags_tag_event", "tag", "event_id"),
+    )
+
+
+def normalize_tags(tags) -> list:
+    """Lowercased, trimmed, de-duplicated (order kept). Non-strings are ignored."""
+    seen = []
+    for tag in tags or []:
+        if isinstance(tag, str):
+            tag = tag.strip().lower()
+            if tag and tag not in seen:
+                seen.append(tag)
+    return seen
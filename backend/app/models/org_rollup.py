@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String
+from app.core.database import Base
+
+class OrgRollup(Base):
+    """
+    Same counters as EventRollup, summed over all events of an organization,
+    so the org dashboard reads a few dozen rows whatever its size.
+    """
+    __tablename__ = "org_rollups"
+
+    org_name = Column(String, primary_key=True)
+    dimension = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0, server_default="0")
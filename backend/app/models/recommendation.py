@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, ForeignKey, JSON, DateTime
+from app.core.database import Base
+from datetime import datetime
+
+class PrecomputedRecommendation(Base):
+    __tablename__ = "precomputed_recommendations"
+
+    # One row per user, looked up by primary key
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+
+    # Ranked event ids, best first
+    event_ids = Column(JSON, default=list, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON, DateTime, UniqueConstraint, CheckConstraint
+from sqlalchemy import Column, Integer, String, ForeignKey, JSON, DateTime, UniqueConstraint, CheckConstraint, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from datetime import datetime
@@ -15,6 +15,7 @@ class Registration(Base):
     # 2. Data
     custom_answers = Column(JSON, default=dict)
     feedback_rating = Column(Integer, nullable=True)
+    feedback_at = Column(DateTime, nullable=True)  # Last rating change (feedback trend)
     registered_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     # 3. Relationships
@@ -25,4 +26,6 @@ class Registration(Base):
     __table_args__ = (
         UniqueConstraint('user_id', 'event_id', name='_user_event_uc'),
         CheckConstraint('feedback_rating >= 1 AND feedback_rating <= 10', name='check_rating_range'),
+        # Organizer listing: an event's registrations in registration order, keyset by id
+        Index('ix_registrations_event_registered', 'event_id', 'registered_at', 'id'),
     )
\ No newline at end of file
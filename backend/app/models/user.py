@@ -25,6 +25,8 @@ class User(Base):
     # 4. Status
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
+    # Bumped on every role change; tokens carrying an older value get their role claims re-checked
+    roles_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # 5. Relationships (Cascade added)
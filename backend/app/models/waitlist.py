@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, ForeignKey, JSON, DateTime, UniqueConstraint, Index
+from app.core.database import Base
+from datetime import datetime
+
+class WaitlistEntry(Base):
+    """Queued registration for a full event; promoted in id order when a seat frees up."""
+    __tablename__ = "waitlist_entries"
+
+    id = Column(Integer, primary_key=True)  # Also the queue order
+    event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    custom_answers = Column(JSON, default=dict)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "event_id", name="_waitlist_user_event_uc"),
+        # Head of the queue / positions: (event_id, id)
+        Index("ix_waitlist_event_order", "event_id", "id"),
+    )
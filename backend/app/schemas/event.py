@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from app.models.enums import OrgType, OrgName
@@ -15,6 +15,7 @@ class EventBase(BaseModel):
     
     tags: List[str] = []
     is_private: bool = False
+    capacity: Optional[int] = None  # None = unlimited
 
 class EventCreate(EventBase):
     target_audience: Optional[Dict[str, Any]] = {}
@@ -25,6 +26,9 @@ class EventOut(EventBase):
     id: int
     image_url: Optional[str] = None
     is_registered: bool = False 
+
+    registration_count: int = 0
+    avg_rating: Optional[float] = None
     
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
@@ -35,4 +39,7 @@ class EventOut(EventBase):
         from_attributes = True
 
 class EventDetail(EventOut):
-    custom_form_schema: List[Dict[str, Any]] = []
\ No newline at end of file
+    custom_form_schema: List[Dict[str, Any]] = []
+
+class FeedbackIn(BaseModel):
+    rating: int = Field(..., ge=1, le=10)
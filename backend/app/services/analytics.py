@@ -0,0 +1,44 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.event import Event
+from app.models.event_rollup import EventRollup
+from app.models.org_rollup import OrgRollup
+from app.services.rollups import read_rollups
+
+
+def _by_count(counts: dict) -> dict:
+    return dict(sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+
+
+def org_dashboard_stats(db: Session, org_name: str) -> dict:
+    """
+    Org totals + audience breakdowns, read from the org_rollups rows (a few
+    dozen, whatever the number of events or registrations).
+    """
+    total_events = db.query(func.count(Event.id)).filter(Event.org_name == org_name).scalar()
+    rollups = read_rollups(db, OrgRollup, OrgRollup.org_name == org_name)
+
+    return {
+        "total_events": total_events,
+        "total_registrations": sum(rollups.get("dept", {}).values()),
+        "dept_analytics": _by_count(rollups.get("dept", {})),
+        "year_analytics": dict(sorted(rollups.get("year", {}).items())),
+        "hostel_analytics": _by_count(rollups.get("hostel", {})),
+        "daily_registrations": dict(sorted(rollups.get("day", {}).items())),
+    }
+
+
+def event_analytics(db: Session, event_id: int) -> dict:
+    """Same breakdowns for one event, plus its rating histogram."""
+    rollups = read_rollups(db, EventRollup, EventRollup.event_id == event_id)
+    return {
+        "total_registrations": sum(rollups.get("dept", {}).values()),
+        "dept_analytics": _by_count(rollups.get("dept", {})),
+        "year_analytics": dict(sorted(rollups.get("year", {}).items())),
+        "hostel_analytics": _by_count(rollups.get("hostel", {})),
+        "daily_registrations": dict(sorted(rollups.get("day", {}).items())),
+        "rating_distribution": {
+            str(i): rollups.get("rating", {}).get(str(i), 0) for i in range(1, 11)
+        },
+    }
+
@@ -0,0 +1,68 @@
+from typing import Optional
+from sqlalchemy import and_, exists, not_, or_
+from sqlalchemy.orm import Session
+from app.models.event import Event
+from app.models.event_audience import EventAudience, audience_value, compile_audience
+
+
+def _kind_allows(kind: str, value):
+    # No rule of this kind = everyone; otherwise the user's value must be listed
+    rule_of_kind = and_(EventAudience.event_id == Event.id, EventAudience.kind == kind)
+    if value is None or str(value).strip() == "":
+        return not_(exists().where(rule_of_kind))
+    return or_(
+        not_(exists().where(rule_of_kind)),
+        exists().where(rule_of_kind, EventAudience.value == audience_value(value)),
+    )
+
+
+def eligibility_clause(
+    department: Optional[str],
+    hostel: Optional[str],
+    current_year: Optional[int],
+):
+    """
+    SQL condition on Event: the user may attend. Open events short-circuit on
+    Event.audience_restricted; restricted ones probe event_audience by primary key.
+    """
+    return or_(
+        Event.audience_restricted == False,  # noqa: E712
+        and_(
+            _kind_allows("dept", department),
+            _kind_allows("hostel", hostel),
+            _kind_allows("year", current_year),
+        ),
+    )
+
+
+def rebuild_audience_index(db: Session, chunk_size: int = 1000) -> int:
+    """
+    Recompiles event_audience and Event.audience_restricted from
+    target_audience (backfill / drift repair). Returns events processed.
+    """
+    table = EventAudience.__table__
+    db.execute(table.delete())
+    processed, last_id = 0, 0
+    while True:
+        chunk = db.query(Event.id, Event.target_audience).filter(
+            Event.id > last_id
+        ).order_by(Event.id).limit(chunk_size).all()
+        if not chunk:
+            break
+        rows, restricted = [], []
+        for event_id, target_audience in chunk:
+            rules = compile_audience(target_audience)
+            rows.extend({"event_id": event_id, "kind": k, "value": v} for k, v in rules)
+            if rules:
+                restricted.append(event_id)
+        if rows:
+            db.execute(table.insert(), rows)
+        ids = [event_id for event_id, _ in chunk]
+        db.query(Event).filter(Event.id.in_(ids)).update(
+            {Event.audience_restricted: Event.id.in_(restricted) if restricted else False},
+            synchronize_session=False,
+        )
+        processed += len(chunk)
+        last_id = chunk[-1][0]
+    db.commit()
+    return processed
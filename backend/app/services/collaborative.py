@@ -0,0 +1,226 @@
+import threading
+import time
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.registration import Registration
+import numpy as np
+import scipy.sparse as sp
+
+
+def interaction_weight(feedback_rating: Optional[int]) -> float:
+    """
+    Registration = 1.0. Once rated (1..10), the rating decides:
+    1 -> 0.2 (barely counts), 5 -> 1.0, 10 -> 2.0.
+    """
+    if not feedback_rating:
+        return 1.0
+    return feedback_rating / 5.0
+
+
+class InteractionIndex:
+    """
+    Item-item collaborative filtering over a sparse user x event matrix.
+
+    X holds one weighted interaction per registration and C = X^T X is the
+    precomputed item co-occurrence matrix (cosine-normalised at query time
+    with sqrt(diag(C))). New interactions are kept in a small pending set and
+    applied as a low-rank delta: only the rows of users that changed are
+    touched. The delta is folded into X and C once it grows past
+    fold_threshold, so writes never pay for a full rebuild.
+
+    Other workers' writes are found through a (COUNT, MAX(id), MAX(feedback_at))
+    marker: plain appends are pulled incrementally; anything else (a
+    cancellation, a rating change, a registration committed out of id order)
+    triggers a full rebuild, at most once per rebuild_interval seconds.
+    """
+
+    def __init__(self, fold_threshold: int = 2000, rebuild_interval: float = 300.0):
+        self.fold_threshold = fold_threshold
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._built = False
+        self._user_row = {}        # user id -> row in X
+        self._item_col = {}        # event id -> column in X / C
+        self._item_ids = []        # column -> event id
+        self._X = sp.csr_matrix((0, 0))
+        self._C = sp.csr_matrix((0, 0))
+        self._pending = {}         # (row, col) -> new weight
+        self._delta = None         # cached (dX, dC) for _pending
+        # Change marker as of the last build / pull, see ensure_fresh
+        self._count = 0
+        self._max_id = 0
+        self._last_feedback_at = None
+        self._built_at = 0.0
+        self._dirty = False
+
+    # ---------------- building ----------------
+
+    def _row(self, user_id: int) -> int:
+        row = self._user_row.get(user_id)
+        if row is None:
+            row = self._user_row[user_id] = len(self._user_row)
+        return row
+
+    def _col(self, event_id: int) -> int:
+        col = self._item_col.get(event_id)
+        if col is None:
+            col = self._item_col[event_id] = len(self._item_ids)
+            self._item_ids.append(event_id)
+        return col
+
+    def _build(self, db: Session):
+        self._user_row, self._item_col, self._item_ids = {}, {}, []
+        rows, cols, vals = [], [], []
+        max_id, last_feedback_at = 0, None
+        query = db.query(
+            Registration.id, Registration.user_id, Registration.event_id,
+            Registration.feedback_rating, Registration.feedback_at,
+        ).order_by(Registration.id).yield_per(10000)
+        for reg_id, user_id, event_id, rating, feedback_at in query:
+            rows.append(self._row(user_id))
+            cols.append(self._col(event_id))
+            vals.append(interaction_weight(rating))
+            max_id = reg_id
+            if feedback_at is not None and (last_feedback_at is None or feedback_at > last_feedback_at):
+                last_feedback_at = feedback_at
+
+        shape = (len(self._user_row), len(self._item_ids))
+        self._X = sp.csr_matrix((vals, (rows, cols)), shape=shape, dtype=np.float64)
+        self._C = (self._X.T @ self._X).tocsr()
+        self._pending = {}
+        self._delta = None
+        self._count, self._max_id, self._last_feedback_at = len(vals), max_id, last_feedback_at
+        self._built_at = time.monotonic()
+        self._dirty = False
+        self._built = True
+
+    def _resize(self):
+        # New users / events only add empty rows & columns
+        n_users, n_items = len(self._user_row), len(self._item_ids)
+        if self._X.shape != (n_users, n_items):
+            self._X.resize((n_users, n_items))
+        if self._C.shape != (n_items, n_items):
+            self._C.resize((n_items, n_items))
+
+    def _delta_matrices(self):
+        """(dX, dC) such that X + dX and C + dC include every pending write."""
+        if self._delta is None:
+            self._resize()
+            rows, cols, vals = [], [], []
+            for (row, col), weight in self._pending.items():
+                rows.append(row)
+                cols.append(col)
+                vals.append(weight - self._X[row, col])
+            dX = sp.csr_matrix((vals, (rows, cols)), shape=self._X.shape, dtype=np.float64)
+
+            # (X + dX)^T (X + dX) - X^T X, restricted to the users that changed
+            touched = sorted(set(rows))
+            X_t, dX_t = self._X[touched], dX[touched]
+            dC = (X_t.T @ dX_t + dX_t.T @ X_t + dX_t.T @ dX_t).tocsr()
+            self._delta = (dX, dC)
+        return self._delta
+
+    def _fold(self):
+        dX, dC = self._delta_matrices()
+        self._X = (self._X + dX).tocsr()
+        self._C = (self._C + dC).tocsr()
+        self._X.eliminate_zeros()
+        self._C.eliminate_zeros()
+        self._pending = {}
+        self._delta = None
+
+    def _set(self, user_id: int, event_id: int, weight: float):
+        self._pending[(self._row(user_id), self._col(event_id))] = weight
+        self._delta = None
+        if len(self._pending) >= self.fold_threshold:
+            self._fold()
+
+    def ensure_fresh(self, db: Session):
+        """
+        Builds on first use. Afterwards one aggregate query tells whether the
+        registrations changed: new rows above the last seen id are pulled and
+        applied as a delta; deletions, rating changes and out-of-order rows
+        (which that can't see) rebuild, throttled by rebuild_interval. Covers
+        writes made by other worker processes.
+        """
+        with self._lock:
+            if not self._built:
+                self._build(db)
+                return
+            count, max_id, last_feedback_at = db.query(
+                func.count(Registration.id), func.max(Registration.id), func.max(Registration.feedback_at)
+            ).one()
+            max_id = max_id or 0
+            if not self._dirty and (count, max_id, last_feedback_at) == (
+                self._count, self._max_id, self._last_feedback_at
+            ):
+                return
+
+            if max_id > self._max_id:
+                new_regs = db.query(
+                    Registration.id, Registration.user_id, Registration.event_id, Registration.feedback_rating
+                ).filter(Registration.id > self._max_id).order_by(Registration.id).all()
+                for reg_id, user_id, event_id, rating in new_regs:
+                    self._set(user_id, event_id, interaction_weight(rating))
+                    self._max_id = reg_id
+                self._count += len(new_regs)
+
+            if count != self._count or last_feedback_at != self._last_feedback_at:
+                self._dirty = True  # Not explained by appends alone
+            if self._dirty and time.monotonic() - self._built_at >= self.rebuild_interval:
+                self._build(db)
+
+    def record(self, user_id: int, event_id: int, feedback_rating: Optional[int] = None):
+        """Hook for registration / feedback writes. Idempotent."""
+        with self._lock:
+            if not self._built:
+                return  # First read builds from the DB anyway
+            self._set(user_id, event_id, interaction_weight(feedback_rating))
+
+    def forget(self, user_id: int, event_id: int):
+        """Hook for cancellations; the zero weight is dropped on the next fold."""
+        with self._lock:
+            if not self._built:
+                return
+            self._set(user_id, event_id, 0.0)
+
+    # ---------------- querying ----------------
+
+    def score_user(self, user_id: int):
+        """
+        Item-item cosine scores for one user, excluding events they already have.
+        Returns (event_ids, scores) arrays, or None if the user has no history.
+        """
+        with self._lock:
+            row = self._user_row.get(user_id)
+            if row is None:
+                return None
+            self._resize()
+            C = self._C
+            x = self._X[row]
+            diag = C.diagonal()
+            if self._pending:
+                dX, dC = self._delta_matrices()
+                x = x + dX[row]
+                diag = diag + dC.diagonal()
+            x = sp.csr_matrix(x)
+            x.eliminate_zeros()
+            if x.nnz == 0:
+                return None
+
+            norms = np.sqrt(diag)
+            norms[norms == 0] = 1.0
+            v = sp.csr_matrix(x.multiply(1.0 / norms))
+            scores = v @ C
+            if self._pending:
+                scores = scores + v @ dC
+            scores = np.asarray(scores.todense()).ravel() / norms
+            scores[x.indices] = 0.0
+
+            nz = np.flatnonzero(scores > 0)
+            item_ids = np.asarray(self._item_ids, dtype=np.int64)
+            return item_ids[nz], scores[nz]
+
+
+interaction_index = InteractionIndex()
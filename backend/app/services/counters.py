@@ -0,0 +1,68 @@
+from typing import Iterable, Optional
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+from app.models.event import Event
+from app.models.registration import Registration
+
+
+def bump_registration_count(db: Session, event_id: int, delta: int = 1):
+    """
+    Atomic in-DB increment (UPDATE ... SET n = n + 1), in the caller's
+    transaction so it commits or rolls back with the registration itself.
+    """
+    db.query(Event).filter(Event.id == event_id).update(
+        {Event.registration_count: Event.registration_count + delta},
+        synchronize_session=False,
+    )
+
+
+def claim_seat(db: Session, event_id: int) -> bool:
+    """
+    bump_registration_count, but only while seats are left:
+    UPDATE ... SET n = n + 1 WHERE capacity IS NULL OR n < capacity.
+    The row lock it takes is held only until the caller commits.
+    """
+    claimed = db.query(Event).filter(
+        Event.id == event_id,
+        or_(Event.capacity.is_(None), Event.registration_count < Event.capacity),
+    ).update(
+        {Event.registration_count: Event.registration_count + 1},
+        synchronize_session=False,
+    )
+    return claimed == 1
+
+
+def bump_rating(db: Session, event_id: int, new_rating: Optional[int], old_rating: Optional[int] = None):
+    """Same as above for feedback: adds the new rating, removes the replaced one."""
+    count_delta = (new_rating is not None) - (old_rating is not None)
+    sum_delta = (new_rating or 0) - (old_rating or 0)
+    if not count_delta and not sum_delta:
+        return
+    db.query(Event).filter(Event.id == event_id).update(
+        {
+            Event.rating_count: Event.rating_count + count_delta,
+            Event.rating_sum: Event.rating_sum + sum_delta,
+        },
+        synchronize_session=False,
+    )
+
+
+def recount_event_counters(db: Session, event_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Repairs drift: recomputes every counter from the registrations table.
+    Returns the number of events updated.
+    """
+    regs_for_event = Registration.event_id == Event.id
+    query = db.query(Event)
+    if event_ids is not None:
+        query = query.filter(Event.id.in_(list(event_ids)))
+    updated = query.update(
+        {
+            Event.registration_count: select(func.count(Registration.id)).where(regs_for_event).scalar_subquery(),
+            Event.rating_count: select(func.count(Registration.feedback_rating)).where(regs_for_event).scalar_subquery(),
+            Event.rating_sum: select(func.coalesce(func.sum(Registration.feedback_rating), 0)).where(regs_for_event).scalar_subquery(),
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    return updated
@@ -0,0 +1,43 @@
+from typing import Any, List, Optional
+from pydantic import TypeAdapter
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.event_tag import normalize_tags
+
+# Serialized anonymous responses for GET /events/ and /events/{id}.
+# Listing keys are normalized query params; detail keys include updated_at,
+# so an edited (or newly registered-for) event never matches an old entry.
+event_response_cache = TTLCache(
+    maxsize=settings.EVENT_RESPONSE_CACHE_SIZE,
+    ttl=settings.EVENT_RESPONSE_CACHE_TTL_SECONDS,
+)
+
+_adapters = {}
+
+
+def dump_json(schema: Any, data: Any) -> bytes:
+    """Same JSON the response_model would produce, as bytes we can hash and replay."""
+    adapter = _adapters.get(schema)
+    if adapter is None:
+        adapter = _adapters[schema] = TypeAdapter(schema)
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+
+def listing_cache_key(
+    sort_by: str,
+    org_type: Optional[str],
+    item: Optional[str],
+    search: Optional[str],
+    tags: Optional[List[str]],
+    cursor: Optional[str],
+    skip: int,
+    limit: int,
+) -> tuple:
+    search = " ".join(search.lower().split()) if search else None
+    tags = tuple(sorted(normalize_tags(tags)))
+    return ("events", sort_by, org_type, item, search, tags, cursor, 0 if cursor else skip, limit)
+
+
+def invalidate_event_responses():
+    """Call after an event is created or edited."""
+    event_response_cache.clear()
@@ -1,59 +1,68 @@
 import csv
 import io
-from sqlalchemy.orm import Session
-from app.models.event import Event
+from typing import Iterator, List
+from sqlalchemy import select
+from app.core.database import SessionLocal
 from app.models.registration import Registration
 from app.models.user import User
 
-def generate_event_registration_csv(db: Session, event_id: int) -> io.StringIO:
+# Rows per DB fetch and per chunk written to the client
+EXPORT_CHUNK_SIZE = 1000
+
+
+def custom_form_labels(custom_form_schema) -> List[str]:
+    # schema looks like [{"label": "Size", ...}]
+    return [q.get("label") for q in (custom_form_schema or [])]
+
+
+def stream_event_registration_csv(event_id: int, custom_keys: List[str]) -> Iterator[str]:
     """
-    Generates a CSV file object for a specific event's registrations.
-    Columns: Name, Email, Entry No, Registered At, Custom Answers...
+    Yields the attendee CSV chunk by chunk, for a StreamingResponse.
+    Columns: Entry No, Name, Email, Department, Hostel, Registered At, Custom Answers...
+
+    Registrations and users come from one join query streamed with
+    yield_per (a server-side cursor on Postgres), so memory stays flat and
+    the first bytes go out before the last row is read. Uses its own
+    session: the generator outlives the request's.
     """
-    
-    # 1. Fetch Data
-    event = db.query(Event).filter(Event.id == event_id).first()
-    registrations = db.query(Registration).filter(Registration.event_id == event_id).all()
-    
-    if not event:
-        raise ValueError("Event not found")
-
-    # 2. Prepare CSV Buffer
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # 3. Define Headers
-    # Base headers
-    headers = ["Entry Number", "Name", "Email", "Department", "Hostel", "Registered At"]
-    
-    # Add dynamic headers from Custom Form (e.g. "T-Shirt Size")
-    custom_keys = []
-    if event.custom_form_schema:
-        # schema looks like [{"label": "Size", ...}]
-        custom_keys = [q.get("label") for q in event.custom_form_schema]
-        headers.extend(custom_keys)
-        
-    writer.writerow(headers)
-    
-    # 4. Write Rows
-    for reg in registrations:
-        user = reg.user
-        row = [
-            user.entry_number,
-            user.name,
-            user.email,
-            user.department,
-            user.hostel,
-            reg.registered_at.strftime("%Y-%m-%d %H:%M")
-        ]
-        
-        # Add custom answers based on keys
-        # custom_answers is a Dict {"Size": "M"}
-        for key in custom_keys:
-            answer = reg.custom_answers.get(key, "") if reg.custom_answers else ""
-            row.append(answer)
-            
-        writer.writerow(row)
-        
-    output.seek(0) # Rewind buffer to start
-    return output
\ No newline at end of file
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    # 1. Headers, base + dynamic ones from the custom form (e.g. "T-Shirt Size")
+    writer.writerow(["Entry Number", "Name", "Email", "Department", "Hostel", "Registered At", *custom_keys])
+    yield flush()
+
+    # 2. Rows
+    stmt = select(
+        User.entry_number, User.name, User.email, User.department, User.hostel,
+        Registration.registered_at, Registration.custom_answers,
+    ).join(
+        User, User.id == Registration.user_id
+    ).where(
+        Registration.event_id == event_id
+    ).order_by(Registration.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+
+    db = SessionLocal()
+    try:
+        for partition in db.execute(stmt).partitions():
+            for entry_number, name, email, department, hostel, registered_at, answers in partition:
+                answers = answers or {}
+                writer.writerow([
+                    entry_number,
+                    name,
+                    email,
+                    department,
+                    hostel,
+                    registered_at.strftime("%Y-%m-%d %H:%M") if registered_at else "",
+                    # custom_answers is a Dict {"Size": "M"}
+                    *(answers.get(key, "") for key in custom_keys),
+                ])
+            yield flush()
+    finally:
+        db.close()
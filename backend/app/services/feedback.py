@@ -0,0 +1,97 @@
+import math
+from collections import Counter
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+from app.models.event import Event
+from app.models.event_rollup import EventRollup
+from app.models.org_rollup import OrgRollup
+from app.models.registration import Registration
+
+PERCENTILES = (25, 50, 75, 90)
+
+
+def summarize(histogram: dict) -> dict:
+    """
+    Average, count, distribution and percentiles from a {rating: count}
+    histogram. Ratings are integers 1-10, so nearest-rank percentiles over
+    the histogram are exact.
+    """
+    count = sum(histogram.values())
+    if not count:
+        return {"average": 0, "count": 0, "distribution": {}, "percentiles": {}}
+
+    percentiles, cumulative = {}, 0
+    ranks = {p: math.ceil(p / 100 * count) for p in PERCENTILES}
+    for rating in sorted(histogram):
+        cumulative += histogram[rating]
+        for p, rank in ranks.items():
+            if f"p{p}" not in percentiles and cumulative >= rank:
+                percentiles[f"p{p}"] = rating
+
+    return {
+        "average": round(sum(r * n for r, n in histogram.items()) / count, 1),
+        "count": count,
+        "distribution": {i: histogram.get(i, 0) for i in range(1, 11)},
+        "percentiles": percentiles,
+    }
+
+
+def event_feedback_stats(db: Session, event_id: int) -> dict:
+    """
+    One GROUP BY (feedback day, rating) over the event's rated registrations:
+    at most 10 rows per day, folded into the overall stats and a daily trend.
+    """
+    day = func.date(Registration.feedback_at)
+    rows = db.query(day, Registration.feedback_rating, func.count(Registration.id)).filter(
+        Registration.event_id == event_id,
+        Registration.feedback_rating.isnot(None),
+    ).group_by(day, Registration.feedback_rating).all()
+
+    histogram, by_day = Counter(), {}
+    for feedback_day, rating, n in rows:
+        histogram[rating] += n
+        if feedback_day is not None:  # Ratings from before feedback_at existed have no day
+            by_day.setdefault(str(feedback_day), Counter())[rating] += n
+
+    stats = summarize(histogram)
+    stats["trend"] = [
+        {
+            "date": feedback_day,
+            "count": sum(counts.values()),
+            "average": round(sum(r * n for r, n in counts.items()) / sum(counts.values()), 1),
+        }
+        for feedback_day, counts in sorted(by_day.items())
+    ]
+    return stats
+
+
+def org_feedback_stats(db: Session, org_name: str) -> dict:
+    """
+    Every event of the org side by side, from the rating rollups: one query,
+    at most 10 rows per event. `overall` comes from the org rollup.
+    """
+    rows = db.query(Event.id, Event.name, Event.date, EventRollup.value, EventRollup.count).outerjoin(
+        EventRollup, and_(
+            EventRollup.event_id == Event.id,
+            EventRollup.dimension == "rating",
+            EventRollup.count > 0,
+        )
+    ).filter(Event.org_name == org_name).order_by(Event.date.desc(), Event.id.desc()).all()
+
+    events, histograms = {}, {}
+    for event_id, name, date, rating, n in rows:
+        if event_id not in events:
+            events[event_id] = {"event_id": event_id, "name": name, "date": date}
+            histograms[event_id] = {}
+        if rating is not None:
+            histograms[event_id][int(rating)] = n
+
+    overall = {
+        int(rating): n for rating, n in db.query(OrgRollup.value, OrgRollup.count).filter(
+            OrgRollup.org_name == org_name, OrgRollup.dimension == "rating", OrgRollup.count > 0,
+        )
+    }
+    return {
+        "overall": summarize(overall),
+        "events": [{**info, **summarize(histograms[event_id])} for event_id, info in events.items()],
+    }
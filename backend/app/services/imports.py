@@ -0,0 +1,123 @@
+import csv
+import io
+from itertools import islice
+from typing import BinaryIO
+from sqlalchemy.orm import Session
+from app.models.event import Event
+from app.models.user import User
+from app.models.waitlist import WaitlistEntry
+from app.services.collaborative import interaction_index
+from app.services.counters import bump_registration_count
+from app.services.recommender import invalidate_many_recommendations
+from app.services.registrations import insert_many_or_ignore
+from app.services.rollups import rollup_registrations
+
+CHUNK_SIZE = 1000
+
+# Accepted header spellings (the export's own headers included, so an
+# exported sheet can be imported back)
+ENTRY_HEADERS = {"entry number", "entry_number", "entry no", "entry no.", "entry"}
+EMAIL_HEADERS = {"email", "e-mail", "email address"}
+
+
+def _find_column(fieldnames, accepted):
+    for name in fieldnames:
+        if name and name.strip().lower() in accepted:
+            return name
+    return None
+
+
+def import_event_registrations_csv(db: Session, event: Event, file: BinaryIO) -> dict:
+    """
+    Registers the users listed in an uploaded CSV (entry number and / or email
+    column) for `event`. Streams the file in CHUNK_SIZE rows: per chunk, two
+    IN queries resolve users and one bulk INSERT skips existing registrations.
+    Columns named like the event's custom form labels become custom_answers.
+    Organizer imports bypass capacity and audience rules (they still count
+    toward registration_count). Raises ValueError on an unusable file.
+    """
+    # 1. Stream + header check
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    try:
+        fieldnames = reader.fieldnames or []
+    except UnicodeDecodeError:
+        raise ValueError("File must be UTF-8 encoded CSV")
+    entry_col = _find_column(fieldnames, ENTRY_HEADERS)
+    email_col = _find_column(fieldnames, EMAIL_HEADERS)
+    if not entry_col and not email_col:
+        raise ValueError("CSV needs an 'Entry Number' or 'Email' column")
+
+    labels = {q.get("label") for q in (event.custom_form_schema or []) if q.get("label")}
+    answer_cols = [name for name in fieldnames if name in labels]
+
+    report = {"total": 0, "imported": 0, "already_registered": 0, "not_found": 0, "duplicate": 0, "invalid": 0}
+    results = []
+    seen_users = set()
+    row_number = 1  # Header is line 1
+
+    try:
+        while True:
+            chunk = list(islice(reader, CHUNK_SIZE))
+            if not chunk:
+                break
+
+            # 2. Resolve users for the whole chunk (indexed IN lookups)
+            keys = []
+            for row in chunk:
+                entry = (row.get(entry_col) or "").strip().upper() if entry_col else ""
+                email = (row.get(email_col) or "").strip() if email_col else ""
+                keys.append((entry, email))
+            entries = {entry for entry, _ in keys if entry}
+            emails = {e for _, email in keys if email for e in (email, email.lower())}
+            by_entry, by_email = {}, {}
+            if entries:
+                by_entry = dict(db.query(User.entry_number, User.id).filter(User.entry_number.in_(entries)))
+            if emails:
+                by_email = {e.lower(): uid for e, uid in db.query(User.email, User.id).filter(User.email.in_(emails))}
+
+            # 3. Classify rows
+            rows, pending = [], []
+            for row, (entry, email) in zip(chunk, keys):
+                row_number += 1
+                result = {"row": row_number, "key": entry or email}
+                results.append(result)
+                if not entry and not email:
+                    result["status"] = "invalid"
+                    continue
+                user_id = by_entry.get(entry) or by_email.get(email.lower())
+                if user_id is None:
+                    result["status"] = "not_found"
+                elif user_id in seen_users:
+                    result["status"] = "duplicate"
+                else:
+                    seen_users.add(user_id)
+                    answers = {col: row[col] for col in answer_cols if row.get(col)}
+                    rows.append({"user_id": user_id, "event_id": event.id, "custom_answers": answers})
+                    pending.append((result, user_id))
+
+            # 4. One bulk insert, conflicts skipped
+            inserted = insert_many_or_ignore(db, rows)
+            for result, user_id in pending:
+                result["status"] = "imported" if user_id in inserted else "already_registered"
+            if inserted:
+                bump_registration_count(db, event.id, len(inserted))
+                rollup_registrations(db, event.id, inserted)
+                db.query(WaitlistEntry).filter(
+                    WaitlistEntry.event_id == event.id, WaitlistEntry.user_id.in_(inserted),
+                ).delete(synchronize_session=False)
+                invalidate_many_recommendations(inserted, db)
+            db.commit()
+            for user_id in inserted:
+                interaction_index.record(user_id, event.id)
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.rollback()
+        raise ValueError(f"Could not read CSV near row {row_number} (earlier rows were imported): {e}")
+    finally:
+        text.detach()  # Leave the upload's file open for the caller
+
+    for result in results:
+        report[result["status"]] += 1
+    report["total"] = len(results)
+    report["rows"] = results
+    return report
@@ -1,47 +1,152 @@
+import asyncio
+import threading
+import time
 import httpx
 from app.core.config import settings
 from fastapi import HTTPException
 
+try:
+    import h2  # noqa: F401  (httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class LatencyStats:
+    """Per-call latency / outcome counters for the outbound OAuth calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def record(self, name: str, seconds: float, outcome: str = "ok"):
+        with self._lock:
+            s = self._calls.setdefault(name, {"count": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0})
+            s["count"] += 1
+            if outcome == "timeout":
+                s["timeouts"] += 1
+            elif outcome != "ok":
+                s["errors"] += 1
+            ms = seconds * 1000
+            s["total_ms"] += ms
+            s["max_ms"] = max(s["max_ms"], ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "count": s["count"],
+                    "errors": s["errors"],
+                    "timeouts": s["timeouts"],
+                    "avg_ms": round(s["total_ms"] / s["count"], 1) if s["count"] else 0.0,
+                    "max_ms": round(s["max_ms"], 1),
+                }
+                for name, s in self._calls.items()
+            }
+
+
+oauth_latency = LatencyStats()
+
+# One pooled client per event loop (normally exactly one: the app's).
+# Keep-alive means a login reuses the open TLS connections to
+# login.microsoftonline.com / graph.microsoft.com instead of handshaking.
+_client = None
+_client_loop = None
+_semaphore = None
+
+
+async def _get_client():
+    global _client, _client_loop, _semaphore
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop or _client.is_closed:
+        old = _client
+        _client = httpx.AsyncClient(
+            http2=settings.MS_HTTP2 and HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(
+                settings.MS_HTTP_READ_TIMEOUT_SECONDS,
+                connect=settings.MS_HTTP_CONNECT_TIMEOUT_SECONDS,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.MS_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.MS_HTTP_MAX_CONNECTIONS,
+            ),
+        )
+        _client_loop = loop
+        _semaphore = asyncio.Semaphore(settings.MS_HTTP_MAX_CONCURRENCY)
+        # Swapped in first, so nothing else picks up the old one meanwhile
+        if old is not None and not old.is_closed:
+            try:
+                await old.aclose()
+            except RuntimeError:
+                pass  # Its loop is gone; the sockets went with it
+    return _client, _semaphore
+
+
+async def close_http_client():
+    """App shutdown hook."""
+    global _client, _client_loop, _semaphore
+    client = _client
+    _client, _client_loop, _semaphore = None, None, None
+    if client is not None:
+        await client.aclose()
+
+
+async def _request(name: str, method: str, url: str, **kwargs) -> httpx.Response:
+    client, semaphore = await _get_client()
+    # Bounded: a login burst queues here instead of opening unbounded sockets
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TimeoutException:
+            oauth_latency.record(name, time.perf_counter() - started, "timeout")
+            raise HTTPException(status_code=504, detail="Microsoft login timed out, please retry")
+        except httpx.HTTPError:
+            oauth_latency.record(name, time.perf_counter() - started, "error")
+            raise HTTPException(status_code=502, detail="Could not reach Microsoft login")
+        oauth_latency.record(name, time.perf_counter() - started, "ok" if response.status_code == 200 else "error")
+        return response
+
+
 async def validate_microsoft_code(code: str):
     """
     Exchanges the auth code from frontend for an Access Token from Azure.
     Then gets the User Profile from Microsoft Graph API.
     """
-    async with httpx.AsyncClient() as client:
-        # 1. Exchange Code for Token
-        token_data = {
-            "client_id": settings.MS_CLIENT_ID,
-            "scope": "User.Read",
-            "code": code,
-            "redirect_uri": settings.MS_REDIRECT_URI,
-            "grant_type": "authorization_code",
-            "client_secret": settings.MS_CLIENT_SECRET,
-        }
-        
-        # Note: Tenant ID 'common' endpoint usually works for multi-tenant or personal
-        # For strict org only, use specific tenant ID url
-        token_url = f"https://login.microsoftonline.com/{settings.MS_TENANT_ID}/oauth2/v2.0/token"
-        
-        r = await client.post(token_url, data=token_data)
-        if r.status_code != 200:
-            raise HTTPException(status_code=400, detail=f"Microsoft Token Error: {r.text}")
-        
-        tokens = r.json()
-        access_token = tokens.get("access_token")
-
-        # 2. Get User Profile using Token
-        graph_url = "https://graph.microsoft.com/v1.0/me"
-        headers = {"Authorization": f"Bearer {access_token}"}
-        
-        me_res = await client.get(graph_url, headers=headers)
-        if me_res.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to fetch MS Profile")
-            
-        user_data = me_res.json()
-        
-        # Return necessary fields
-        return {
-            "email": user_data.get("mail") or user_data.get("userPrincipalName"),
-            "name": user_data.get("displayName"),
-            "oid": user_data.get("id")
-        }
\ No newline at end of file
+    # 1. Exchange Code for Token
+    token_data = {
+        "client_id": settings.MS_CLIENT_ID,
+        "scope": "User.Read",
+        "code": code,
+        "redirect_uri": settings.MS_REDIRECT_URI,
+        "grant_type": "authorization_code",
+        "client_secret": settings.MS_CLIENT_SECRET,
+    }
+
+    # Note: Tenant ID 'common' endpoint usually works for multi-tenant or personal
+    # For strict org only, use specific tenant ID url
+    token_url = f"{settings.MS_LOGIN_BASE_URL}/{settings.MS_TENANT_ID}/oauth2/v2.0/token"
+
+    r = await _request("token", "POST", token_url, data=token_data)
+    if r.status_code != 200:
+        raise HTTPException(status_code=400, detail=f"Microsoft Token Error: {r.text}")
+
+    tokens = r.json()
+    access_token = tokens.get("access_token")
+
+    # 2. Get User Profile using Token
+    graph_url = f"{settings.MS_GRAPH_BASE_URL}/v1.0/me"
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    me_res = await _request("graph_me", "GET", graph_url, headers=headers)
+    if me_res.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to fetch MS Profile")
+
+    user_data = me_res.json()
+
+    # Return necessary fields
+    return {
+        "email": user_data.get("mail") or user_data.get("userPrincipalName"),
+        "name": user_data.get("displayName"),
+        "oid": user_data.get("id")
+    }
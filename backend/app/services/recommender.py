@@ -1,90 +1,478 @@
+import threading
+from typing import NamedTuple
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, or_, select
 from sqlalchemy.orm import Session
 from app.models.event import Event
 from app.models.user import User
 from app.models.registration import Registration
+from app.models.recommendation import PrecomputedRecommendation
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services.collaborative import interaction_index
+from app.services.audience import eligibility_clause
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pandas as pd
+import numpy as np
+import scipy.sparse as sp
+
+
+def _event_text(name: str, description: str, tags) -> str:
+    # Create a "soup" of words: "Coding Workshop Python DevClub..."
+    tags_str = " ".join(tags) if tags else ""
+    return f"{name} {description} {tags_str}"
+
+
+def _profile_text(interests, past_tags) -> str:
+    # Explicit interests + tags of events the user registered for
+    user_interests = " ".join(interests) if interests else ""
+    return user_interests + " " + " ".join(past_tags)
+
+
+class IndexSnapshot(NamedTuple):
+    """
+    One consistent view of the index. Appends and rebuilds swap in new
+    objects instead of mutating these, so a snapshot never changes under
+    the reader.
+    """
+    vectorizer: object
+    matrix: object             # (n_events x vocab) CSR, rows are L2-normalised
+    event_ids: list            # row -> event id
+    row_of: dict               # event id -> row
+
+    def rows_for(self, event_ids):
+        row_of = self.row_of
+        return [row_of[eid] for eid in event_ids if eid in row_of]
+
+    def score(self, profile_text: str, rows: np.ndarray):
+        """
+        Projects a user profile onto the candidate rows only.
+        Returns (rows, scores) with only the non-zero scores, or None if
+        nothing is indexed. Rows are L2-normalised, so the dot product is
+        the cosine similarity.
+        """
+        if self.vectorizer is None or self.matrix is None:
+            return None
+        profile = self.vectorizer.transform([profile_text])
+        scores = (profile @ self.matrix[rows].T).tocsr()
+        return rows[scores.indices], scores.data
+
+
+class EventIndex:
+    """
+    Long-lived TF-IDF index over the event catalog.
+
+    The vectorizer is fitted once per process and kept in memory together with
+    the sparse event matrix. New events are appended using the existing
+    vocabulary; once enough rows have been appended the IDF weights are stale
+    and the next read refits from the database.
+    """
+
+    def __init__(self, refit_ratio: float = 0.2):
+        self.refit_ratio = refit_ratio
+        self._lock = threading.Lock()
+        self._vectorizer = None
+        self._matrix = None        # (n_events x vocab) CSR, rows are L2-normalised
+        self._event_ids = []       # row -> event id
+        self._row_of = {}          # event id -> row
+        self._fitted_rows = 0
+        self._stale = True
+        # What the DB looked like at the last check. Only ensure_fresh moves
+        # these: add_event indexes one local event, it says nothing about
+        # events other workers created meanwhile (possibly with lower ids).
+        self._db_max_id = 0
+        self._db_count = 0
+
+    # ---------------- building ----------------
+
+    def _rebuild(self, db: Session):
+        rows = db.query(Event.id, Event.name, Event.description, Event.tags).order_by(Event.id).all()
+        vectorizer = None
+        matrix = None
+        if rows:
+            corpus = [_event_text(r.name, r.description, r.tags) for r in rows]
+            try:
+                vectorizer = TfidfVectorizer(stop_words='english')
+                matrix = vectorizer.fit_transform(corpus).tocsr()
+            except ValueError:
+                # Empty vocabulary (e.g. only stop words)
+                vectorizer = None
+                matrix = None
+
+        event_ids = [r.id for r in rows] if matrix is not None else []
+        self._vectorizer = vectorizer
+        self._matrix = matrix
+        self._event_ids = event_ids
+        self._row_of = {eid: i for i, eid in enumerate(event_ids)}
+        self._fitted_rows = len(event_ids)
+        self._db_max_id = rows[-1].id if rows else 0
+        self._db_count = len(rows)
+        self._stale = False
+
+    def _append(self, rows):
+        """Append (id, name, description, tags) rows using the current vocabulary."""
+        rows = [r for r in rows if r[0] not in self._row_of]
+        if not rows or self._vectorizer is None:
+            return
+        new = self._vectorizer.transform([_event_text(r[1], r[2], r[3]) for r in rows])
+        # Copy-on-write: snapshots handed out earlier keep their own objects
+        event_ids = self._event_ids + [r[0] for r in rows]
+        row_of = dict(self._row_of)
+        row_of.update((r[0], len(self._event_ids) + i) for i, r in enumerate(rows))
+        self._matrix = sp.vstack([self._matrix, new], format="csr")
+        self._event_ids = event_ids
+        self._row_of = row_of
+        if len(self._event_ids) - self._fitted_rows > self.refit_ratio * max(self._fitted_rows, 1):
+            self._stale = True
+
+    def ensure_fresh(self, db: Session):
+        """
+        Makes sure the index covers every event in the DB.
+        Cheap when nothing changed: a single COUNT / MAX(id) lookup.
+        Also picks up events created by other worker processes, including
+        ones whose ids are lower than an event this worker indexed itself.
+        """
+        with self._lock:
+            if self._stale or self._vectorizer is None:
+                self._rebuild(db)
+                return
+            count, max_id = db.query(func.count(Event.id), func.max(Event.id)).one()
+            max_id = max_id or 0
+            if max_id == self._db_max_id and count == self._db_count:
+                return
+            # Something changed: diff the id sets (ids only, then the missing rows)
+            known = self._row_of
+            missing_ids = [eid for (eid,) in db.query(Event.id) if eid not in known]
+            if missing_ids:
+                missing = db.query(Event.id, Event.name, Event.description, Event.tags).filter(
+                    Event.id.in_(missing_ids)
+                ).order_by(Event.id).all()
+                self._append(missing)
+            self._db_max_id, self._db_count = max_id, count
+            if self._stale:
+                self._rebuild(db)
+
+    def add_event(self, event: Event):
+        """Hook for create_org_event: index the new event without a refit."""
+        with self._lock:
+            if self._stale or self._vectorizer is None:
+                return  # Next read rebuilds from the DB anyway
+            self._append([(event.id, event.name, event.description, event.tags)])
+
+    def invalidate(self):
+        with self._lock:
+            self._stale = True
+
+    # ---------------- querying ----------------
+
+    def snapshot(self) -> IndexSnapshot:
+        """Consistent view to rank against; taken once per request / batch job."""
+        with self._lock:
+            return IndexSnapshot(self._vectorizer, self._matrix, self._event_ids, self._row_of)
+
+
+event_index = EventIndex()
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first (no full sort)."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def _blend(rows: np.ndarray, scores: np.ndarray, collaborative, candidates: np.ndarray, row_of: dict):
+    """
+    Mixes content scores (sparse, by index row) with item-item scores from
+    interaction_index, keeping only the (sorted) candidate rows. Each side is
+    scaled to [0, 1] over the candidates before weighting. `row_of` comes from
+    the same snapshot as the rows.
+    """
+    keep = np.isin(rows, candidates)
+    rows, scores = rows[keep], scores[keep]
+    if collaborative is None:
+        return rows, scores
+    cf_ids, cf_scores = collaborative
+    pairs = [(row_of[eid], s) for eid, s in zip(cf_ids.tolist(), cf_scores) if eid in row_of]
+    cf_rows = np.fromiter((p[0] for p in pairs), dtype=np.int64, count=len(pairs))
+    cf_vals = np.fromiter((p[1] for p in pairs), dtype=np.float64, count=len(pairs))
+    keep = np.isin(cf_rows, candidates)
+    cf_rows, cf_vals = cf_rows[keep], cf_vals[keep]
+    if not len(cf_rows):
+        return rows, scores
+
+    alpha = settings.RECOMMENDATION_CF_WEIGHT
+    content_max = scores.max() if len(scores) else 0.0
+    content_vals = (1 - alpha) * scores / content_max if content_max > 0 else scores
+
+    all_rows = np.concatenate([rows.astype(np.int64), cf_rows])
+    all_vals = np.concatenate([content_vals, alpha * cf_vals / cf_vals.max()])
+    merged_rows, inverse = np.unique(all_rows, return_inverse=True)
+    return merged_rows, np.bincount(inverse, weights=all_vals)
+
+
+def _rank_row(idx: np.ndarray, vals: np.ndarray, candidates: np.ndarray, top_n: int):
+    """
+    Top-n rows from one sparse score row (already restricted to candidates,
+    see _blend). Candidates without a score fill the remaining slots in
+    catalog order.
+    """
+    ranked = [int(i) for i in idx[_top_k(vals, top_n)]] if len(vals) else []
+    if len(ranked) < top_n:
+        taken = set(ranked)
+        ranked.extend(int(r) for r in candidates[:top_n + len(taken)] if r not in taken)
+    return ranked[:top_n]
+
+
+def _upcoming_events(db: Session):
+    """
+    Candidate set, filtered in SQL: upcoming, visible (not member-only)
+    events, soonest first. Returns a query over Event.id.
+    """
+    return db.query(Event.id).filter(
+        Event.date >= datetime.utcnow(),
+        Event.is_private == False,  # noqa: E712
+    ).order_by(Event.date.asc(), Event.id.asc())
+
+
+def _eligible(db: Session, department, hostel, current_year):
+    """Event ids (soonest first) from the candidate set the user may attend."""
+    query = _upcoming_events(db).filter(eligibility_clause(department, hostel, current_year))
+    return [event_id for (event_id,) in query]
+
+
+recommendation_cache = TTLCache(
+    maxsize=settings.RECOMMENDATION_CACHE_SIZE,
+    ttl=settings.RECOMMENDATION_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_user_recommendations(user_id: int, db: Session = None):
+    """
+    Call when a user's profile or registrations change.
+    With a session, the user's precomputed row is dropped too (caller commits).
+    """
+    recommendation_cache.pop(user_id)
+    if db is not None:
+        db.query(PrecomputedRecommendation).filter(
+            PrecomputedRecommendation.user_id == user_id
+        ).delete(synchronize_session=False)
+
+
+def invalidate_many_recommendations(user_ids, db: Session):
+    """Batch form of the above: one DELETE for all the users (caller commits)."""
+    user_ids = list(set(user_ids))
+    for user_id in user_ids:
+        recommendation_cache.pop(user_id)
+    if user_ids:
+        db.query(PrecomputedRecommendation).filter(
+            PrecomputedRecommendation.user_id.in_(user_ids)
+        ).delete(synchronize_session=False)
+
+
+def notify_event_created(event: Event):
+    """Call after a new event is committed."""
+    event_index.add_event(event)
+    recommendation_cache.clear()
+
+
+def _load_events(db: Session, event_ids):
+    """Fetch events by id, preserving the given order."""
+    if not event_ids:
+        return []
+    events_by_id = {e.id: e for e in db.query(Event).filter(Event.id.in_(event_ids)).all()}
+    return [events_by_id[i] for i in event_ids if i in events_by_id]
+
+
+def _load_upcoming(db: Session, event_ids, limit: int):
+    """
+    Stored ids (cache / batch) can outlive their events: keeps the order,
+    drops events that have started since, then takes `limit`.
+    """
+    if not event_ids:
+        return []
+    events_by_id = {e.id: e for e in db.query(Event).filter(
+        Event.id.in_(event_ids), Event.date >= datetime.utcnow(),
+    )}
+    return [events_by_id[i] for i in event_ids if i in events_by_id][:limit]
+
 
 def get_event_recommendations(db: Session, user_id: int, limit: int = 5):
     """
     Returns a list of Event objects sorted by relevance to the user.
     Logic: Content-Based Filtering using Event Tags + Description.
+    Results are cached per user (as event ids) until invalidated or expired.
     """
-    
+    cached = recommendation_cache.get(user_id)
+    if cached is not None:
+        cached_limit, cached_ids = cached
+        if cached_limit >= limit:
+            return _load_upcoming(db, cached_ids, limit)
+
+    # Nightly / on-demand batch results (see precompute_all_recommendations),
+    # unless an event was created since: the batch never saw it
+    max_age = timedelta(hours=settings.RECOMMENDATION_PRECOMPUTE_MAX_AGE_HOURS)
+    newest_event = select(func.max(Event.created_at)).scalar_subquery()
+    snapshot = db.query(PrecomputedRecommendation).filter(
+        PrecomputedRecommendation.user_id == user_id,
+        PrecomputedRecommendation.computed_at >= datetime.utcnow() - max_age,
+        or_(newest_event.is_(None), PrecomputedRecommendation.computed_at >= newest_event),
+    ).first()
+    if snapshot is not None:
+        recommendation_cache.set(user_id, (max(limit, len(snapshot.event_ids)), snapshot.event_ids))
+        return _load_upcoming(db, snapshot.event_ids, limit)
+
+    event_ids = _compute_recommendation_ids(db, user_id, limit)
+    if event_ids is None:
+        return []
+    recommendation_cache.set(user_id, (limit, event_ids))
+    return _load_events(db, event_ids)
+
+
+def _compute_recommendation_ids(db: Session, user_id: int, limit: int):
+    """Ranks events for one user. Returns event ids, or None for unknown users."""
+
     # 1. Fetch User & History
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
-        return []
+        return None
 
-    # Get all future events
-    all_events = db.query(Event).all()
-    if not all_events:
-        return []
+    event_index.ensure_fresh(db)
+    interaction_index.ensure_fresh(db)
 
     # 2. Build User Profile String
-    # Combine explicitly selected interests
-    user_interests = " ".join(user.interests) if user.interests else ""
-    
     # Add tags from events they previously registered for
-    # (In a real app, weigh this by feedback rating)
-    past_regs = db.query(Registration).filter(Registration.user_id == user_id).all()
-    past_event_ids = [r.event_id for r in past_regs]
-    
+    # (feedback ratings are weighed in by the collaborative side, step 5)
+    past = db.query(Event.id, Event.tags).join(
+        Registration, Registration.event_id == Event.id
+    ).filter(Registration.user_id == user_id).all()
+    past_event_ids = {p.id for p in past}
+
     past_events_tags = []
-    for reg in past_regs:
-        if reg.event.tags:
-            past_events_tags.extend(reg.event.tags)
-            
-    user_profile_str = user_interests + " " + " ".join(past_events_tags)
+    for p in past:
+        if p.tags:
+            past_events_tags.extend(p.tags)
 
-    # 3. Handle "Cold Start" (No data)
-    # If user has no interests and no history, just return upcoming events sorted by date
-    if not user_profile_str.strip():
-        return sorted(all_events, key=lambda x: x.date)[:limit]
-
-    # 4. Build Event Corpus (Text data for AI)
-    # We combine Name + Description + Tags for better matching
-    event_corpus = []
-    active_events = [] # Keep track of event objects matching corpus indices
-    
-    for e in all_events:
-        # Skip events user already registered for (optional)
-        if e.id in past_event_ids:
-            continue
-            
-        tags_str = " ".join(e.tags) if e.tags else ""
-        # Create a "soup" of words: "Coding Workshop Python DevClub..."
-        content = f"{e.name} {e.description} {tags_str}"
-        event_corpus.append(content)
-        active_events.append(e)
-
-    if not event_corpus:
+    user_profile_str = _profile_text(user.interests, past_events_tags)
+
+    # 3. Candidate set: upcoming, visible events meant for this user
+    eligible_ids = _eligible(db, user.department, user.hostel, user.current_year)
+    eligible_ids = [eid for eid in eligible_ids if eid not in past_event_ids]
+    if not eligible_ids:
         return []
 
-    # 5. TF-IDF & Cosine Similarity
-    # Add user profile as the first item to compare against others
-    corpus = [user_profile_str] + event_corpus
-    
-    try:
-        tfidf = TfidfVectorizer(stop_words='english')
-        tfidf_matrix = tfidf.fit_transform(corpus)
-        
-        # Compare User (Index 0) vs All Events (Index 1 to End)
-        cosine_sim = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:])
-        
-        # Get scores: [(Index, Score), ...]
-        sim_scores = list(enumerate(cosine_sim[0]))
-        
-        # Sort by score (Highest first)
-        sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-        
-        # Get top N events
-        top_indices = [i[0] for i in sim_scores[:limit]]
-        recommended_events = [active_events[i] for i in top_indices]
-        
-        return recommended_events
-
-    except ValueError:
-        # Fallback if TF-IDF fails (e.g., empty words)
-        return active_events[:limit]
\ No newline at end of file
+    collaborative = interaction_index.score_user(user_id)
+
+    # 4. Handle "Cold Start" (No data)
+    # If user has no interests and no history, just return upcoming events sorted by date
+    if not user_profile_str.strip() and collaborative is None:
+        return eligible_ids[:limit]
+
+    # 5. Score only the candidates (one sparse dot product)
+    index = event_index.snapshot()
+    candidates = np.asarray(sorted(index.rows_for(eligible_ids)), dtype=np.int64)
+    result = index.score(user_profile_str, candidates)
+    if result is None:
+        # Fallback if nothing could be indexed (e.g. empty vocabulary)
+        return eligible_ids[:limit]
+
+    rows, scores = result
+
+    # 6. Blend with "students who went to X also went to Y"
+    rows, scores = _blend(rows, scores, collaborative, candidates, index.row_of)
+
+    # 7. Top-k (argpartition, no full sort)
+    ranked = _rank_row(rows, scores, candidates, limit)
+    return [index.event_ids[r] for r in ranked]
+
+
+# ------------------------------------------------------------------
+# BATCH PRECOMPUTE
+# ------------------------------------------------------------------
+
+
+def precompute_all_recommendations(db: Session, top_n: int = 20, chunk_size: int = 500) -> int:
+    """
+    Computes top-n recommendations for every user and stores them in
+    precomputed_recommendations. Users are processed in chunks: one sparse
+    (users x vocab) profile matrix per chunk times the candidate event matrix,
+    so memory is bounded by chunk_size. Returns the number of users written.
+    """
+    event_index.ensure_fresh(db)
+    interaction_index.ensure_fresh(db)
+    index = event_index.snapshot()
+    vectorizer, matrix = index.vectorizer, index.matrix
+    event_ids_arr = np.asarray(index.event_ids, dtype=np.int64)
+
+    # Same candidate set as the live path, resolved once per audience
+    upcoming = [event_id for (event_id,) in _upcoming_events(db)]
+    all_rows = np.asarray(sorted(index.rows_for(upcoming)), dtype=np.int64)
+    audiences = {}
+
+    written = 0
+    last_user_id = 0
+    while True:
+        users = db.query(
+            User.id, User.interests, User.department, User.hostel, User.current_year
+        ).filter(User.id > last_user_id).order_by(User.id).limit(chunk_size).all()
+        if not users:
+            break
+        last_user_id = users[-1].id
+        user_ids = [u.id for u in users]
+
+        # Registration history for the whole chunk in one query
+        past_ids = {uid: set() for uid in user_ids}
+        past_tags = {uid: [] for uid in user_ids}
+        history = db.query(Registration.user_id, Event.id, Event.tags).join(
+            Event, Registration.event_id == Event.id
+        ).filter(Registration.user_id.in_(user_ids)).all()
+        for uid, eid, tags in history:
+            past_ids[uid].add(eid)
+            if tags:
+                past_tags[uid].extend(tags)
+
+        profiles = [_profile_text(u.interests, past_tags[u.id]) for u in users]
+
+        scores = None
+        if vectorizer is not None and matrix is not None and len(all_rows):
+            profile_matrix = vectorizer.transform(profiles)
+            scores = (profile_matrix @ matrix[all_rows].T).tocsr()
+
+        rows = []
+        for i, u in enumerate(users):
+            key = (u.department, u.hostel, u.current_year)
+            if key not in audiences:
+                ids = _eligible(db, *key)
+                audiences[key] = (ids, np.asarray(sorted(index.rows_for(ids)), dtype=np.int64))
+            eligible_ids, candidates = audiences[key]
+
+            past = past_ids[u.id]
+            if past:
+                eligible_ids = [eid for eid in eligible_ids if eid not in past]
+                candidates = candidates[~np.isin(candidates, index.rows_for(past))]
+
+            collaborative = interaction_index.score_user(u.id)
+            if not eligible_ids:
+                ranked = []
+            elif (not profiles[i].strip() and collaborative is None) or scores is None:
+                ranked = eligible_ids[:top_n]
+            else:
+                start, end = scores.indptr[i], scores.indptr[i + 1]
+                idx, vals = _blend(
+                    all_rows[scores.indices[start:end]], scores.data[start:end], collaborative, candidates,
+                    index.row_of,
+                )
+                ranked_rows = _rank_row(idx, vals, candidates, top_n)
+                ranked = [int(event_ids_arr[r]) for r in ranked_rows]
+            rows.append({"user_id": u.id, "event_ids": ranked, "computed_at": datetime.utcnow()})
+
+        # Replace the chunk's rows (portable upsert)
+        db.query(PrecomputedRecommendation).filter(
+            PrecomputedRecommendation.user_id.in_(user_ids)
+        ).delete(synchronize_session=False)
+        db.execute(insert(PrecomputedRecommendation), rows)
+        db.commit()
+        written += len(rows)
+
+    recommendation_cache.clear()
+    return written
@@ -0,0 +1,283 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import NamedTuple, Optional
+from fastapi import HTTPException
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.event import Event
+from app.models.registration import Registration
+from app.models.waitlist import WaitlistEntry
+from app.services.collaborative import interaction_index
+from app.services.counters import bump_registration_count
+from app.services.recommender import invalidate_many_recommendations
+from app.services.registrations import register_user
+from app.services.rollups import rollup_registrations
+
+logger = logging.getLogger(__name__)
+
+# How often an idle writer checks for shutdown
+STOP_POLL_SECONDS = 0.5
+
+
+class Job(NamedTuple):
+    ticket: str
+    event_id: int
+    user: object  # deps.Principal
+    custom_answers: dict
+    enqueued_at: float
+
+
+def _failed(status_code: int, detail: str) -> dict:
+    return {"status": "failed", "status_code": status_code, "detail": detail}
+
+
+ALREADY_REGISTERED = _failed(400, "Already registered")
+ALREADY_WAITLISTED = _failed(400, "Already on the waitlist")
+
+
+def write_batch(db: Session, jobs: list) -> dict:
+    """
+    Group commit: one transaction and executemany INSERTs for the whole batch.
+    Returns {ticket: result}. Audience checks happened at enqueue time.
+    """
+    results = {}
+
+    # 1. Same user + event twice in one batch: the first one wins
+    seen, todo = set(), []
+    for job in jobs:
+        key = (job.user.id, job.event_id)
+        if key in seen:
+            results[job.ticket] = ALREADY_REGISTERED
+        else:
+            seen.add(key)
+            todo.append(job)
+    event_ids = sorted({job.event_id for job in todo})
+    user_ids = {job.user.id for job in todo}
+
+    # 2. Lock the events rows (id order, so two batches can't deadlock) and read the seats
+    seats = {
+        event_id: [capacity, count]
+        for event_id, capacity, count in db.query(
+            Event.id, Event.capacity, Event.registration_count
+        ).filter(Event.id.in_(event_ids)).order_by(Event.id).with_for_update()
+    }
+
+    # 3. Existing rows, batched IN queries
+    registered = set(db.query(Registration.user_id, Registration.event_id).filter(
+        Registration.event_id.in_(event_ids), Registration.user_id.in_(user_ids),
+    ))
+    waitlisted = set(db.query(WaitlistEntry.user_id, WaitlistEntry.event_id).filter(
+        WaitlistEntry.event_id.in_(event_ids), WaitlistEntry.user_id.in_(user_ids),
+    ))
+
+    # 4. Seats in arrival order, the rest to the waitlist
+    reg_rows, wait_rows, accepted, overflow = [], [], Counter(), {}
+    for job in todo:
+        key = (job.user.id, job.event_id)
+        row = {"user_id": job.user.id, "event_id": job.event_id, "custom_answers": job.custom_answers}
+        if job.event_id not in seats:
+            results[job.ticket] = _failed(404, "Event not found")
+        elif key in registered:
+            results[job.ticket] = ALREADY_REGISTERED
+        elif key in waitlisted:
+            results[job.ticket] = ALREADY_WAITLISTED
+        elif seats[job.event_id][0] is None or seats[job.event_id][1] < seats[job.event_id][0]:
+            seats[job.event_id][1] += 1
+            accepted[job.event_id] += 1
+            reg_rows.append(row)
+            results[job.ticket] = {"status": "success", "msg": "Registered successfully"}
+        else:
+            overflow.setdefault(job.event_id, []).append(job)
+            wait_rows.append(row)
+
+    for event_id, waiting in overflow.items():
+        ahead = db.query(func.count(WaitlistEntry.id)).filter(WaitlistEntry.event_id == event_id).scalar()
+        for i, job in enumerate(waiting, start=1):
+            results[job.ticket] = {
+                "status": "waitlisted", "msg": "Event is full, you are on the waitlist", "position": ahead + i,
+            }
+
+    # 5. executemany
+    if reg_rows:
+        db.execute(insert(Registration), reg_rows)
+    if wait_rows:
+        db.execute(insert(WaitlistEntry), wait_rows)
+    for event_id, n in accepted.items():
+        bump_registration_count(db, event_id, n)
+        rollup_registrations(db, event_id, [row["user_id"] for row in reg_rows if row["event_id"] == event_id])
+    invalidate_many_recommendations((row["user_id"] for row in reg_rows), db)
+    db.commit()
+
+    for row in reg_rows:
+        interaction_index.record(row["user_id"], row["event_id"])
+    return results
+
+
+class RegistrationQueue:
+    """
+    Bounded in-process write-behind queue for POST /events/{id}/register?queued=true.
+    One writer thread per worker drains it in batches; results are kept by
+    ticket for REGISTRATION_STATUS_TTL_SECONDS. Per worker, like the caches:
+    a ticket is only known to the worker that accepted it.
+    """
+
+    def __init__(self, maxsize: int, batch_size: int, max_wait: float, status_ttl: float):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue(maxsize)
+        self._results = TTLCache(maxsize=max(maxsize * 10, 1000), ttl=status_ttl)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "accepted": 0, "rejected": 0, "batches": 0, "written": 0, "fallbacks": 0,
+            "batch_ms_total": 0.0, "batch_ms_max": 0.0, "wait_ms_max": 0.0,
+        }
+
+    # ---------------- producer side ----------------
+
+    def submit(self, event_id: int, user, custom_answers: dict) -> Optional[str]:
+        """Ticket id, or None when the queue is full (backpressure)."""
+        self._ensure_worker()
+        ticket = uuid.uuid4().hex
+        self._results.set(ticket, {"user_id": user.id, "event_id": event_id, "result": {"status": "pending"}})
+        try:
+            self._queue.put_nowait(Job(ticket, event_id, user, custom_answers, time.monotonic()))
+        except queue.Full:
+            self._results.pop(ticket)
+            self._count(rejected=1)
+            return None
+        self._count(accepted=1)
+        return ticket
+
+    def status(self, ticket: str, user_id: int, event_id: int) -> Optional[dict]:
+        entry = self._results.get(ticket)
+        if entry is None or entry["user_id"] != user_id or entry["event_id"] != event_id:
+            return None
+        return entry["result"]
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            s = dict(self._stats)
+        batches = s.pop("batches")
+        batch_ms_total = s.pop("batch_ms_total")
+        return {
+            "depth": self._queue.qsize(),
+            "maxsize": self._queue.maxsize,
+            "batches": batches,
+            "avg_batch_size": round(s["written"] / batches, 1) if batches else 0.0,
+            "avg_batch_ms": round(batch_ms_total / batches, 1) if batches else 0.0,
+            "max_batch_ms": round(s.pop("batch_ms_max"), 1),
+            "max_queue_wait_ms": round(s.pop("wait_ms_max"), 1),
+            **s,
+        }
+
+    # ---------------- writer side ----------------
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="registration-writer", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self) -> list:
+        """Next batch, or [] once stop() was called and the queue is drained."""
+        while True:
+            try:
+                batch = [self._queue.get(timeout=STOP_POLL_SECONDS)]
+                break
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            jobs = self._next_batch()
+            if not jobs:
+                return
+            self._flush(jobs)
+
+    def _flush(self, jobs: list):
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            try:
+                results = write_batch(db, jobs)
+            except Exception:
+                # Usually a registration that raced in through the direct path.
+                # Redo this batch one row at a time on the conflict-safe path.
+                logger.warning("Registration batch failed, retrying row by row", exc_info=True)
+                db.rollback()
+                self._count(fallbacks=1)
+                results = {job.ticket: self._write_one(db, job) for job in jobs}
+        finally:
+            db.close()
+
+        for job in jobs:
+            entry = self._results.get(job.ticket)
+            if entry is not None:
+                self._results.set(job.ticket, {**entry, "result": results[job.ticket]})
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        wait_ms = (time.monotonic() - min(job.enqueued_at for job in jobs)) * 1000
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["written"] += len(jobs)
+            self._stats["batch_ms_total"] += elapsed_ms
+            self._stats["batch_ms_max"] = max(self._stats["batch_ms_max"], elapsed_ms)
+            self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+
+    @staticmethod
+    def _write_one(db: Session, job: Job) -> dict:
+        try:
+            return register_user(db, job.event_id, job.user, job.custom_answers)
+        except HTTPException as e:
+            db.rollback()
+            return _failed(e.status_code, e.detail)
+        except Exception:
+            logger.exception("Queued registration %s failed", job.ticket)
+            db.rollback()
+            return _failed(500, "Registration failed, please retry")
+
+    def stop(self, timeout: float = 10.0):
+        """
+        App shutdown hook: drains what is queued, then stops the writer.
+        Signalled through an Event, not a queue sentinel, so a full queue
+        can't block or fail the shutdown.
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+registration_queue = RegistrationQueue(
+    maxsize=settings.REGISTRATION_QUEUE_SIZE,
+    batch_size=settings.REGISTRATION_QUEUE_BATCH_SIZE,
+    max_wait=settings.REGISTRATION_QUEUE_MAX_WAIT_MS / 1000,
+    status_ttl=settings.REGISTRATION_STATUS_TTL_SECONDS,
+)
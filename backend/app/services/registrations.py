@@ -0,0 +1,293 @@
+from datetime import datetime
+from typing import Iterable, Optional, Set
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.event import Event
+from app.models.registration import Registration
+from app.models.user import User
+from app.models.waitlist import WaitlistEntry
+from app.services.audience import eligibility_clause
+from app.services.collaborative import interaction_index
+from app.services.counters import bump_rating, bump_registration_count, claim_seat
+from app.services.recommender import invalidate_user_recommendations
+from app.services.rollups import registration_deltas, rollup_rating, rollup_registrations, stage_deltas
+
+
+def registered_event_ids(db: Session, user_id: int, event_ids: Iterable[int]) -> Set[int]:
+    """
+    Which of `event_ids` the user is registered for, in one indexed query:
+    SELECT event_id FROM registrations WHERE user_id = ? AND event_id IN (...)
+    """
+    event_ids = list(set(event_ids))
+    if not event_ids:
+        return set()
+    rows = db.query(Registration.event_id).filter(
+        Registration.user_id == user_id,
+        Registration.event_id.in_(event_ids),
+    ).all()
+    return {event_id for (event_id,) in rows}
+
+
+def is_registered(db: Session, user_id: int, event_id: int) -> bool:
+    """EXISTS check for a single event."""
+    query = db.query(Registration.id).filter(
+        Registration.user_id == user_id,
+        Registration.event_id == event_id,
+    )
+    return db.query(query.exists()).scalar()
+
+
+# Sortable columns of the organizer listing. Nullable profile fields are
+# coalesced so the keyset comparison never meets a NULL.
+REGISTRATION_SORTS = {
+    "registered_at": Registration.registered_at,
+    "name": User.name,
+    "entry_number": func.coalesce(User.entry_number, ""),
+    "department": func.coalesce(User.department, ""),
+    "year": func.coalesce(User.current_year, 0),
+}
+
+
+def event_registrations_query(
+    db: Session,
+    event_id: int,
+    sort_by: str = "registered_at",
+    department: Optional[str] = None,
+    year: Optional[int] = None,
+    hostel: Optional[str] = None,
+    registered_from: Optional[datetime] = None,
+    registered_to: Optional[datetime] = None,
+):
+    """
+    Column-projected registrations + registrant join (plain rows, no ORM
+    objects). The sort expression is selected as `sort_key` for the cursor.
+    """
+    query = db.query(
+        Registration.id.label("registration_id"),
+        User.name, User.email, User.entry_number,
+        User.department, User.current_year, User.hostel,
+        Registration.custom_answers, Registration.registered_at, Registration.feedback_rating,
+        REGISTRATION_SORTS[sort_by].label("sort_key"),
+    ).join(User, User.id == Registration.user_id).filter(Registration.event_id == event_id)
+
+    if department:
+        query = query.filter(User.department == department)
+    if year is not None:
+        query = query.filter(User.current_year == year)
+    if hostel:
+        query = query.filter(User.hostel == hostel)
+    if registered_from:
+        query = query.filter(Registration.registered_at >= registered_from)
+    if registered_to:
+        query = query.filter(Registration.registered_at < registered_to)
+    return query
+
+
+def annotate_registered(db: Session, events: list, user_id: Optional[int]) -> list:
+    """
+    Sets `is_registered` on Event objects before they go out as EventOut.
+    Never touches user.registrations (which would load every row the user has).
+    """
+    if user_id is None:
+        registered = set()
+    elif len(events) == 1:
+        registered = {events[0].id} if is_registered(db, user_id, events[0].id) else set()
+    else:
+        registered = registered_event_ids(db, user_id, (e.id for e in events))
+    for e in events:
+        e.is_registered = e.id in registered
+    return events
+
+
+def _insert_or_ignore(db: Session, model, values: dict) -> Optional[int]:
+    """
+    INSERT ... ON CONFLICT DO NOTHING RETURNING id: the new id, or None if the
+    row already exists. One statement, so two concurrent requests can't both
+    pass a "not registered yet" check and then trip the unique constraint.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(model).values(**values).on_conflict_do_nothing().returning(model.id)
+        return db.execute(stmt).scalar()
+
+    # Other databases: savepoint + unique constraint
+    try:
+        with db.begin_nested():
+            row = model(**values)
+            db.add(row)
+        return row.id
+    except IntegrityError:
+        return None
+
+
+def insert_many_or_ignore(db: Session, rows: list) -> Set[int]:
+    """
+    Bulk registrations with conflict skipping: one executemany INSERT ... ON
+    CONFLICT DO NOTHING RETURNING user_id. Rows share one event_id; returns
+    the user ids actually inserted.
+    """
+    if not rows:
+        return set()
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(Registration).on_conflict_do_nothing().returning(Registration.user_id)
+        return set(db.scalars(stmt, rows))
+
+    # Other databases: filter out existing rows, then a plain bulk insert
+    existing = registered_user_ids(db, rows[0]["event_id"], [r["user_id"] for r in rows])
+    rows = [r for r in rows if r["user_id"] not in existing]
+    if rows:
+        db.execute(Registration.__table__.insert(), rows)
+    return {r["user_id"] for r in rows}
+
+
+def registered_user_ids(db: Session, event_id: int, user_ids: Iterable[int]) -> Set[int]:
+    """Which of `user_ids` are registered for the event (one IN query)."""
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return set()
+    rows = db.query(Registration.user_id).filter(
+        Registration.event_id == event_id,
+        Registration.user_id.in_(user_ids),
+    ).all()
+    return {user_id for (user_id,) in rows}
+
+
+def waitlist_position(db: Session, event_id: int, entry_id: int) -> int:
+    """1-based; counted on ix_waitlist_event_order."""
+    return db.query(func.count(WaitlistEntry.id)).filter(
+        WaitlistEntry.event_id == event_id,
+        WaitlistEntry.id <= entry_id,
+    ).scalar()
+
+
+def check_registrable(db: Session, event_id: int, user):
+    """Event exists + audience check, one round trip. Raises 404 / 403."""
+    row = db.query(
+        Event.id,
+        eligibility_clause(user.department, user.hostel, user.current_year),
+    ).filter(Event.id == event_id).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if not row[1]:
+        raise HTTPException(status_code=403, detail="This event is not open to your department / hostel / year")
+
+
+def register_user(db: Session, event_id: int, user, custom_answers: dict) -> dict:
+    """
+    The registration write path. Statement order keeps locks short: the
+    conflict-checked INSERT only touches this user's (user_id, event_id) key,
+    and the shared events row is locked last, by the seat UPDATE, with only
+    the commit after it. Everything else (recommendation invalidation, the
+    rollup facts read) runs before the seat is claimed.
+    """
+    # 1. Event exists + audience check
+    check_registrable(db, event_id, user)
+
+    # 2. Insert-or-conflict instead of check-then-insert
+    values = {"user_id": user.id, "event_id": event_id, "custom_answers": custom_answers}
+    registration_id = _insert_or_ignore(db, Registration, values)
+    if registration_id is None:
+        raise HTTPException(status_code=400, detail="Already registered")
+
+    # 3. Side work that doesn't need the seat yet (rollups staged only if it's claimed)
+    rollup = registration_deltas(db, event_id, [user.id])
+    invalidate_user_recommendations(user.id, db)
+
+    # 4. Take a seat (atomic, capacity-aware counter); full -> waitlist
+    if not claim_seat(db, event_id):
+        db.query(Registration).filter(Registration.id == registration_id).delete(synchronize_session=False)
+        entry_id = _insert_or_ignore(db, WaitlistEntry, values)
+        if entry_id is None:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Already on the waitlist")
+        position = waitlist_position(db, event_id, entry_id)
+        db.commit()
+        return {"status": "waitlisted", "msg": "Event is full, you are on the waitlist", "position": position}
+
+    stage_deltas(db, rollup)
+    db.commit()
+    interaction_index.record(user.id, event_id)
+    return {"status": "success", "msg": "Registered successfully"}
+
+
+def _promote_from_waitlist(db: Session, event_id: int) -> Optional[int]:
+    """
+    Hands a freed seat to the head of the waitlist. SKIP LOCKED (Postgres) lets
+    concurrent cancellations promote different people instead of queueing on
+    the same row. Returns the promoted user id, or None if nobody is waiting.
+    """
+    while True:
+        entry = db.query(WaitlistEntry).filter(
+            WaitlistEntry.event_id == event_id
+        ).order_by(WaitlistEntry.id).with_for_update(skip_locked=True).first()
+        if entry is None:
+            return None
+        db.delete(entry)
+        promoted = _insert_or_ignore(db, Registration, {
+            "user_id": entry.user_id, "event_id": event_id, "custom_answers": entry.custom_answers,
+        })
+        if promoted is not None:
+            return entry.user_id
+        # Already registered some other way (e.g. capacity was raised): next one
+
+
+def cancel_registration(db: Session, event_id: int, user_id: int) -> dict:
+    """Frees the seat (or leaves the waitlist); the seat goes to the next in line."""
+    rating = db.query(Registration.feedback_rating).filter(
+        Registration.user_id == user_id, Registration.event_id == event_id,
+    ).first()
+    if rating is None:
+        left = db.query(WaitlistEntry).filter(
+            WaitlistEntry.user_id == user_id, WaitlistEntry.event_id == event_id,
+        ).delete(synchronize_session=False)
+        if not left:
+            raise HTTPException(status_code=404, detail="Not registered for this event")
+        db.commit()
+        return {"status": "success", "msg": "Removed from the waitlist"}
+
+    rollup_registrations(db, event_id, [user_id], -1)  # Reads the row, so before the DELETE
+    db.query(Registration).filter(
+        Registration.user_id == user_id, Registration.event_id == event_id,
+    ).delete(synchronize_session=False)
+    bump_rating(db, event_id, None, rating[0])
+
+    promoted = _promote_from_waitlist(db, event_id)
+    if promoted is None:
+        bump_registration_count(db, event_id, -1)  # Seat count stays as is when it changes hands
+    else:
+        rollup_registrations(db, event_id, [promoted])
+        invalidate_user_recommendations(promoted, db)
+    invalidate_user_recommendations(user_id, db)
+    db.commit()
+
+    interaction_index.forget(user_id, event_id)
+    if promoted is not None:
+        interaction_index.record(promoted, event_id)
+    return {"status": "success", "msg": "Registration cancelled"}
+
+
+def submit_feedback(db: Session, event_id: int, user_id: int, rating: int) -> dict:
+    """Rate an attended event (1-10); a second submission replaces the first."""
+    registration = db.query(Registration).filter(
+        Registration.user_id == user_id, Registration.event_id == event_id,
+    ).first()
+    if registration is None:
+        raise HTTPException(status_code=404, detail="Not registered for this event")
+    if db.query(Event.date).filter(Event.id == event_id).scalar() > datetime.utcnow():
+        raise HTTPException(status_code=400, detail="Feedback opens once the event has started")
+
+    old_rating = registration.feedback_rating
+    registration.feedback_rating = rating
+    registration.feedback_at = datetime.utcnow()
+    bump_rating(db, event_id, rating, old_rating)
+    rollup_rating(db, event_id, rating, old_rating)
+    invalidate_user_recommendations(user_id, db)
+    db.commit()
+    interaction_index.record(user_id, event_id, rating)
+    return {"status": "success", "msg": "Thanks for your feedback!"}
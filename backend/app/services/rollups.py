@@ -0,0 +1,284 @@
+import logging
+import threading
+from collections import Counter
+from typing import Iterable, Optional
+from sqlalchemy import event as sa_event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.event import Event
+from app.models.event_rollup import EventRollup
+from app.models.org_rollup import OrgRollup
+from app.models.registration import Registration
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN = "Unknown"
+EVENT_KEYS = ("event_id", "dimension", "value")
+ORG_KEYS = ("org_name", "dimension", "value")
+
+
+def label(value) -> str:
+    """Rollup value for a profile field; blanks are grouped as "Unknown"."""
+    return UNKNOWN if value is None or value == "" else str(value)
+
+
+def _facts(db: Session, *filters):
+    """One row per registration with everything the rollups are keyed on."""
+    return db.query(
+        Event.org_name, Registration.event_id,
+        User.department, User.current_year, User.hostel,
+        Registration.registered_at, Registration.feedback_rating,
+    ).join(
+        User, User.id == Registration.user_id
+    ).join(
+        Event, Event.id == Registration.event_id
+    ).filter(*filters)
+
+
+def _add(event_deltas: Counter, org_deltas: Counter, facts: Iterable, sign: int):
+    for org_name, event_id, department, year, hostel, registered_at, rating in facts:
+        keys = [
+            ("dept", label(department)),
+            ("year", label(year)),
+            ("hostel", label(hostel)),
+            ("day", registered_at.date().isoformat() if registered_at else UNKNOWN),
+        ]
+        if rating is not None:
+            keys.append(("rating", str(rating)))
+        for dimension, value in keys:
+            event_deltas[(event_id, dimension, value)] += sign
+            org_deltas[(org_name, dimension, value)] += sign
+
+
+def _upsert(db: Session, model, key_names: tuple, deltas: Counter):
+    """
+    count += delta per key, executemany INSERT ... ON CONFLICT DO UPDATE.
+    Keys are written in sorted order so concurrent writers lock rows in the
+    same order and can't deadlock each other.
+    """
+    rows = [
+        {**dict(zip(key_names, key)), "count": delta}
+        for key, delta in sorted(deltas.items()) if delta
+    ]
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(model.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_names),
+            set_={"count": model.__table__.c.count + stmt.excluded.count},
+        )
+        db.execute(stmt, rows)
+        return
+
+    # Other databases: UPDATE, INSERT when the key is new
+    for row in rows:
+        updated = db.query(model).filter(
+            *(getattr(model, name) == row[name] for name in key_names)
+        ).update({model.count: model.count + row["count"]}, synchronize_session=False)
+        if not updated:
+            db.add(model(**row))
+    db.flush()
+
+
+# ---------------- write-behind ----------------
+
+class RollupWriter:
+    """
+    Folds committed rollup deltas into event_rollups / org_rollups from a
+    background thread, every ROLLUP_FLUSH_INTERVAL_SECONDS, in its own
+    transaction. The per-org / per-day rows are shared by every registration
+    of an org, so upserting them inside the request would serialize those
+    requests on one row lock; here a whole interval of deltas costs one
+    executemany per table. Per worker; deltas not yet flushed when a worker
+    dies are lost until the next `rebuild-rollups`.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._event_deltas, self._org_deltas = Counter(), Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._failures = 0  # Consecutive failed flushes
+
+    def add(self, event_deltas: Counter, org_deltas: Counter):
+        with self._lock:
+            self._event_deltas.update(event_deltas)
+            self._org_deltas.update(org_deltas)
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="rollup-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        """Writes out everything buffered so far (also called on shutdown)."""
+        with self._flush_lock:
+            with self._lock:
+                event_deltas, self._event_deltas = self._event_deltas, Counter()
+                org_deltas, self._org_deltas = self._org_deltas, Counter()
+            if not event_deltas and not org_deltas:
+                return
+            db = SessionLocal()
+            try:
+                _upsert(db, EventRollup, EVENT_KEYS, event_deltas)
+                _upsert(db, OrgRollup, ORG_KEYS, org_deltas)
+                db.commit()
+                self._failures = 0
+            except Exception:
+                db.rollback()
+                self._failures += 1
+                if self._failures < settings.ROLLUP_FLUSH_MAX_ATTEMPTS:
+                    logger.warning("Rollup flush failed, keeping the deltas for the next one", exc_info=True)
+                    self.add(event_deltas, org_deltas)
+                else:
+                    # Still failing: write key by key, so one bad delta can't block the rest
+                    logger.error("Rollup flush failed %d times, writing key by key", self._failures, exc_info=True)
+                    self._failures = 0
+                    self._flush_each(db, event_deltas, org_deltas)
+            finally:
+                db.close()
+
+    @staticmethod
+    def _flush_each(db: Session, event_deltas: Counter, org_deltas: Counter):
+        dropped = 0
+        for model, key_names, deltas in ((EventRollup, EVENT_KEYS, event_deltas), (OrgRollup, ORG_KEYS, org_deltas)):
+            for key, delta in deltas.items():
+                try:
+                    with db.begin_nested():
+                        _upsert(db, model, key_names, Counter({key: delta}))
+                except Exception:
+                    logger.error("Dropped rollup delta %s %s %+d", model.__tablename__, key, delta, exc_info=True)
+                    dropped += 1
+        db.commit()
+        if dropped:
+            logger.error("Dropped %d rollup deltas; run `python -m app.cli rebuild-rollups` to repair", dropped)
+
+    def stop(self, timeout: float = 10.0):
+        """App shutdown hook: stops the thread, then flushes what is left."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+
+rollup_writer = RollupWriter(interval=settings.ROLLUP_FLUSH_INTERVAL_SECONDS)
+
+_PENDING = "rollup_deltas"
+
+
+def _stage(db: Session, event_deltas: Counter, org_deltas: Counter):
+    """Keeps the deltas on the session; they go to rollup_writer only if it commits."""
+    pending = db.info.setdefault(_PENDING, (Counter(), Counter()))
+    pending[0].update(event_deltas)
+    pending[1].update(org_deltas)
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _hand_over(session):
+    pending = session.info.pop(_PENDING, None)
+    if pending is not None:
+        rollup_writer.add(*pending)
+
+
+@sa_event.listens_for(Session, "after_transaction_end")
+def _discard(session, transaction):
+    if transaction.parent is None:  # Outermost: rolled back / closed without a commit
+        session.info.pop(_PENDING, None)
+
+
+def _apply(db: Session, facts: Iterable, sign: int):
+    event_deltas, org_deltas = Counter(), Counter()
+    _add(event_deltas, org_deltas, facts, sign)
+    _stage(db, event_deltas, org_deltas)
+
+
+# ---------------- write hooks (read-only here, applied after the caller commits) ----------------
+
+def registration_deltas(db: Session, event_id: int, user_ids: Iterable[int], sign: int = 1):
+    """
+    The (event, org) deltas rollup_registrations would stage, without staging
+    them: lets a caller read the facts early and stage only if the write
+    goes through (see register_user).
+    """
+    event_deltas, org_deltas = Counter(), Counter()
+    user_ids = list(user_ids)
+    if user_ids:
+        facts = _facts(db, Registration.event_id == event_id, Registration.user_id.in_(user_ids))
+        _add(event_deltas, org_deltas, facts, sign)
+    return event_deltas, org_deltas
+
+
+def stage_deltas(db: Session, deltas):
+    _stage(db, *deltas)
+
+
+def rollup_registrations(db: Session, event_id: int, user_ids: Iterable[int], sign: int = 1):
+    """
+    +1 after registrations are inserted, -1 before they are deleted
+    (the rows are read back, so call it while they exist).
+    """
+    stage_deltas(db, registration_deltas(db, event_id, user_ids, sign))
+
+
+def rollup_user(db: Session, user_id: int, sign: int):
+    """
+    Profile changes move a user between departments / years / hostels:
+    -1 with the old profile, flush the change, then +1 with the new one.
+    """
+    _apply(db, _facts(db, Registration.user_id == user_id), sign)
+
+
+def rollup_rating(db: Session, event_id: int, new_rating: Optional[int], old_rating: Optional[int] = None):
+    """Rating histogram only, for feedback writes."""
+    if new_rating == old_rating:
+        return
+    org_name = db.query(Event.org_name).filter(Event.id == event_id).scalar()
+    event_deltas, org_deltas = Counter(), Counter()
+    for rating, sign in ((new_rating, 1), (old_rating, -1)):
+        if rating is not None:
+            event_deltas[(event_id, "rating", str(rating))] += sign
+            org_deltas[(org_name, "rating", str(rating))] += sign
+    _stage(db, event_deltas, org_deltas)
+
+
+# ---------------- reads / repair ----------------
+
+def read_rollups(db: Session, model, *filters) -> dict:
+    """{dimension: {value: count}} for the matching rows."""
+    result = {}
+    for dimension, value, count in db.query(model.dimension, model.value, model.count).filter(
+        *filters, model.count > 0
+    ):
+        result.setdefault(dimension, {})[value] = count
+    return result
+
+
+def rebuild_rollups(db: Session, chunk_size: int = 5000) -> int:
+    """
+    Recomputes both rollup tables from registrations (backfill / drift
+    repair), streaming the rows. Returns the number of registrations read.
+    """
+    rollup_writer.flush()
+    event_deltas, org_deltas = Counter(), Counter()
+    read = 0
+    for fact in _facts(db).yield_per(chunk_size):
+        _add(event_deltas, org_deltas, [fact], 1)
+        read += 1
+
+    db.execute(EventRollup.__table__.delete())
+    db.execute(OrgRollup.__table__.delete())
+    _upsert(db, EventRollup, EVENT_KEYS, event_deltas)
+    _upsert(db, OrgRollup, ORG_KEYS, org_deltas)
+    db.commit()
+    return read
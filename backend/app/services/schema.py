@@ -0,0 +1,44 @@
+from typing import List
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+from app.core.database import Base
+
+
+def upgrade_schema(engine: Engine) -> List[str]:
+    """
+    Brings an existing database up to the models (additive only): creates
+    missing tables, adds missing columns with their server defaults (so NOT
+    NULL counters start at 0), then missing indexes.
+    Nothing is dropped or altered. Every model module must be imported.
+    Returns the DDL that was run.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    applied = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                table.create(conn)
+                applied.append(f"CREATE TABLE {table.name}")
+                continue
+
+            # 1. Columns
+            columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(dialect=engine.dialect)}"
+                conn.exec_driver_sql(ddl)
+                applied.append(ddl)
+
+            # 2. Indexes (dialect-specific ones, e.g. the Postgres GIN index, only where they apply)
+            indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                ddl_if = index._ddl_if
+                if index.name in indexes or (ddl_if is not None and ddl_if.dialect not in (None, engine.dialect.name)):
+                    continue
+                index.create(conn)
+                applied.append(f"CREATE INDEX {index.name}")
+
+    return applied
@@ -0,0 +1,93 @@
+import re
+import time
+from sqlalchemy import Column, Float, Integer, MetaData, Table, func, text
+from sqlalchemy.orm import Query, Session
+from app.models.event import Event, SEARCH_CONFIG, SQLITE_FTS_DDL, search_vector
+
+# Lightweight handle on the SQLite FTS5 table (own MetaData: never create_all'd)
+events_fts = Table(
+    "events_fts", MetaData(),
+    Column("rowid", Integer),
+    Column("rank", Float),
+    Column("events_fts", Float),  # hidden column used as the MATCH target
+)
+
+_fts_available = {}  # url -> True, or the monotonic time "missing" was last seen
+# A missing index is probed again after this long, so workers pick up
+# `rebuild-search-index` without a restart
+FTS_RECHECK_SECONDS = 60
+
+
+def _terms(search: str) -> list:
+    # Only word characters reach the engine: no query-syntax injection
+    return re.findall(r"\w+", search.lower())[:10]
+
+
+def fts_available(db: Session) -> bool:
+    """Whether the full-text structures exist for this database (cached)."""
+    bind = db.get_bind()
+    key = str(bind.url)
+    cached = _fts_available.get(key)
+    if cached is True or (cached is not None and time.monotonic() - cached < FTS_RECHECK_SECONDS):
+        return cached is True
+    dialect = bind.dialect.name
+    if dialect == "postgresql":
+        found = db.execute(text("SELECT to_regclass('ix_events_search')")).scalar()
+    elif dialect == "sqlite":
+        found = db.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'events_fts'"
+        )).scalar()
+    else:
+        found = None
+    _fts_available[key] = True if found is not None else time.monotonic()
+    return found is not None
+
+
+def apply_search(db: Session, query: Query, search: str, rank: bool = False) -> Query:
+    """
+    Filters an Event query with full-text search over name, description,
+    tags and org_name. Every term must match; the last word is treated as a
+    prefix so search-as-you-type keeps working ("hack" -> "hackathon").
+    With rank=True, results are ordered by relevance.
+    Falls back to the old name ILIKE when no index is available.
+    """
+    terms = _terms(search)
+    if not terms:
+        return query
+
+    if not fts_available(db):
+        return query.filter(Event.name.ilike(f"%{search}%"))
+
+    if db.get_bind().dialect.name == "postgresql":
+        ts_query = func.to_tsquery(SEARCH_CONFIG, " & ".join(terms[:-1] + [f"{terms[-1]}:*"]))
+        query = query.filter(search_vector.op("@@")(ts_query))
+        if rank:
+            query = query.order_by(func.ts_rank(search_vector, ts_query).desc())
+        return query
+
+    # SQLite FTS5: bm25 "rank" is lower-is-better
+    match = " ".join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+    query = query.join(events_fts, events_fts.c.rowid == Event.id).filter(
+        events_fts.c.events_fts.op("MATCH")(match.strip())
+    )
+    if rank:
+        query = query.order_by(events_fts.c.rank.asc())
+    return query
+
+
+def rebuild_search_index(db: Session):
+    """Creates missing search structures and re-indexes every event."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        # Postgres maintains the GIN index itself; it only has to exist
+        for index in Event.__table__.indexes:
+            if index.name == "ix_events_search":
+                index.create(db.connection(), checkfirst=True)
+    elif dialect == "sqlite":
+        # Older databases have an update trigger that fires on every column
+        db.execute(text("DROP TRIGGER IF EXISTS events_fts_au"))
+        for statement in SQLITE_FTS_DDL:
+            db.execute(text(statement))
+        db.execute(text("INSERT INTO events_fts(events_fts) VALUES ('rebuild')"))
+    db.commit()
+    _fts_available.clear()
@@ -0,0 +1,46 @@
+from typing import List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.orm import Query, Session
+from app.models.event import Event
+from app.models.event_tag import EventTag, normalize_tags
+
+
+def filter_by_tags(query: Query, tags: Optional[List[str]]) -> Query:
+    """
+    Keeps events carrying ALL the given tags (drill-down, like the facets).
+    Each tag is one probe of ix_event_tags_tag_event.
+    """
+    for tag in normalize_tags(tags):
+        query = query.filter(Event.id.in_(select(EventTag.event_id).where(EventTag.tag == tag)))
+    return query
+
+
+def tag_facets(db: Session, events: Optional[Query] = None, limit: int = 50) -> list:
+    """
+    [{"tag": ..., "count": ...}] most common first, over the events matched by
+    `events` (an Event query with filters applied) or the whole catalog.
+    """
+    count = func.count(EventTag.event_id)
+    query = db.query(EventTag.tag, count)
+    if events is not None:
+        query = query.filter(EventTag.event_id.in_(events.with_entities(Event.id).order_by(None)))
+    rows = query.group_by(EventTag.tag).order_by(count.desc(), EventTag.tag).limit(limit).all()
+    return [{"tag": tag, "count": n} for tag, n in rows]
+
+
+def rebuild_tag_index(db: Session, chunk_size: int = 1000) -> int:
+    """Re-derives event_tags from Event.tags (backfill / drift repair). Returns rows written."""
+    table = EventTag.__table__
+    db.execute(table.delete())
+    written, last_id = 0, 0
+    while True:
+        chunk = db.query(Event.id, Event.tags).filter(Event.id > last_id).order_by(Event.id).limit(chunk_size).all()
+        if not chunk:
+            break
+        rows = [{"event_id": event_id, "tag": tag} for event_id, tags in chunk for tag in normalize_tags(tags)]
+        if rows:
+            db.execute(table.insert(), rows)
+        written += len(rows)
+        last_id = chunk[-1][0]
+    db.commit()
+    return written
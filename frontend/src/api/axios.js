@@ -16,4 +16,24 @@ api.interceptors.request.use(
   (error) => Promise.reject(error)
 );
 
+// The backend re-issues the token when our role claims are out of date,
+// also on the 403 that a role change causes, so errors are checked too
+const storeFreshToken = (headers) => {
+  const freshToken = headers?.['x-access-token'];
+  if (freshToken) {
+    localStorage.setItem('access_token', freshToken);
+  }
+};
+
+api.interceptors.response.use(
+  (response) => {
+    storeFreshToken(response.headers);
+    return response;
+  },
+  (error) => {
+    storeFreshToken(error.response?.headers);
+    return Promise.reject(error);
+  }
+);
+
 export default api;
\ No newline at end of file
@@ -218,6 +218,12 @@ const OrgDashboard = () => {
               <div className="col-md-6" style={{ height: '300px' }}>
                 <DemographicsChart type="doughnut" title="Audience by Dept" data={stats?.dept_analytics || {}} />
               </div>
+              <div className="col-md-6" style={{ height: '300px' }}>
+                <DemographicsChart type="bar" title="Audience by Year" data={stats?.year_analytics || {}} />
+              </div>
+              <div className="col-md-6" style={{ height: '300px' }}>
+                <DemographicsChart type="bar" title="Audience by Hostel" data={stats?.hostel_analytics || {}} />
+              </div>
             </div>
           </div>
         </div>